@@ -477,25 +477,26 @@ def update_fuzzer_jobs(fuzzer_entities, job_names):
   """Update fuzzer job mappings."""
   to_delete = {}
 
-  for fuzzer_entity_key in fuzzer_entities:
-    fuzzer_entity = fuzzer_entity_key.get()
+  for job in data_types.Job.query():
+    if not job.environment_string:
+      continue
 
-    for job in data_types.Job.query():
-      if not job.environment_string:
-        continue
+    job_environment = job.get_environment()
+    if not utils.string_is_true(job_environment.get('MANAGED', 'False')):
+      continue
 
-      job_environment = job.get_environment()
-      if not utils.string_is_true(job_environment.get('MANAGED', 'False')):
-        continue
+    if job.name in job_names:
+      continue
 
-      if job.name in job_names:
-        continue
+    logs.log(f'Deleting job {job.name}')
+    to_delete[job.name] = job.key
 
-      logs.log(f'Deleting job {job.name}')
-      to_delete[job.name] = job.key
+  for fuzzer_entity_key in fuzzer_entities:
+    fuzzer_entity = fuzzer_entity_key.get()
 
+    for job_name in to_delete:
       try:
-        fuzzer_entity.jobs.remove(job.name)
+        fuzzer_entity.jobs.remove(job_name)
       except ValueError:
         pass
 
@@ -756,18 +757,26 @@ class ProjectSetup:
     """Sync the config with ClusterFuzz."""
     # Create/update ClusterFuzz jobs.
     job_names = []
+    jobs_to_put = {}
+    fuzzer_entities = {}
+    fuzzers_to_put = {}
 
     for template in get_jobs_for_project(project, info):
       if template.engine == 'none':
         # Engine-less jobs are not automatically managed.
         continue
 
-      fuzzer_entity = self._fuzzer_entities.get(template.engine).get()
+      fuzzer_entity = fuzzer_entities.get(template.engine)
       if not fuzzer_entity:
-        raise ProjectSetupError('Invalid fuzzing engine ' + template.engine)
+        fuzzer_entity = self._fuzzer_entities.get(template.engine).get()
+        if not fuzzer_entity:
+          raise ProjectSetupError('Invalid fuzzing engine ' + template.engine)
+        fuzzer_entities[template.engine] = fuzzer_entity
 
       job_name = template.job_name(project, self._config_suffix)
-      job = data_types.Job.query(data_types.Job.name == job_name).get()
+      job = jobs_to_put.get(job_name)
+      if not job:
+        job = data_types.Job.query(data_types.Job.name == job_name).get()
       if not job:
         job = data_types.Job()
 
@@ -789,7 +798,7 @@ class ProjectSetup:
         if job_name not in fuzzer_entity.jobs and not job.is_external():
           # Enable new job.
           fuzzer_entity.jobs.append(job_name)
-          fuzzer_entity.put()
+          fuzzers_to_put[template.engine] = fuzzer_entity
 
       job.name = job_name
       if self._segregate_projects:
@@ -808,18 +817,20 @@ class ProjectSetup:
             project, info, template.engine, template.memory_tool,
             template.architecture)
       base_project_name = self._get_base_project_name(project)
-      job.environment_string = JOB_TEMPLATE.format(
-          build_type=self._build_type,
-          build_bucket_path=build_bucket_path,
-          engine=template.engine,
-          project_name=base_project_name)
+      environment_lines = [
+          JOB_TEMPLATE.format(
+              build_type=self._build_type,
+              build_bucket_path=build_bucket_path,
+              engine=template.engine,
+              project_name=base_project_name)
+      ]
 
       # Centipede requires a separate build of the sanitized binary.
       if template.engine == 'centipede':
         extra_build_bucket_path = self._get_build_bucket_path(
             project, info, template.engine, template.memory_tool,
             template.architecture)
-        job.environment_string += (
+        environment_lines.append(
             f'EXTRA_BUILD_BUCKET_PATH = {extra_build_bucket_path}\n')
       if self._add_revision_mappings:
         revision_vars_url = self._revision_url_template.format(
@@ -828,20 +839,20 @@ class ProjectSetup:
                                           template.architecture),
             sanitizer=template.memory_tool)
 
-        job.environment_string += f'REVISION_VARS_URL = {revision_vars_url}\n'
+        environment_lines.append(f'REVISION_VARS_URL = {revision_vars_url}\n')
 
       if logs_bucket_name:
-        job.environment_string += f'FUZZ_LOGS_BUCKET = {logs_bucket_name}\n'
+        environment_lines.append(f'FUZZ_LOGS_BUCKET = {logs_bucket_name}\n')
 
       if corpus_bucket_name:
-        job.environment_string += f'CORPUS_BUCKET = {corpus_bucket_name}\n'
+        environment_lines.append(f'CORPUS_BUCKET = {corpus_bucket_name}\n')
 
       if quarantine_bucket_name:
-        job.environment_string += (
+        environment_lines.append(
             f'QUARANTINE_BUCKET = {quarantine_bucket_name}\n')
 
       if backup_bucket_name:
-        job.environment_string += f'BACKUP_BUCKET = {backup_bucket_name}\n'
+        environment_lines.append(f'BACKUP_BUCKET = {backup_bucket_name}\n')
 
       if self._add_info_labels:
         automatic_labels = [f'Proj-{project}', f'Engine-{template.engine}']
@@ -849,28 +860,28 @@ class ProjectSetup:
         if labels and '*' in labels:
           automatic_labels.extend(labels['*'])
         automatic_labels = ','.join(automatic_labels)
-        job.environment_string += f'AUTOMATIC_LABELS = {automatic_labels}\n'
+        environment_lines.append(f'AUTOMATIC_LABELS = {automatic_labels}\n')
 
       help_url = info.get('help_url')
       if help_url:
-        job.environment_string += f'HELP_URL = {help_url}\n'
+        environment_lines.append(f'HELP_URL = {help_url}\n')
 
       if (template.experimental or
           (self._experimental_sanitizers and
            template.memory_tool in self._experimental_sanitizers)):
-        job.environment_string += 'EXPERIMENTAL = True\n'
+        environment_lines.append('EXPERIMENTAL = True\n')
 
       if template.minimize_job_override:
         minimize_job_override = template.minimize_job_override.job_name(
             project, self._config_suffix)
-        job.environment_string += (
+        environment_lines.append(
             f'MINIMIZE_JOB_OVERRIDE = {minimize_job_override}\n')
 
       view_restrictions = info.get('view_restrictions')
       if view_restrictions:
         view_restrictions = view_restrictions.lower()
         if view_restrictions in ALLOWED_VIEW_RESTRICTIONS:
-          job.environment_string += (
+          environment_lines.append(
               f'ISSUE_VIEW_RESTRICTIONS = {view_restrictions}\n')
         else:
           logs.log_error(
@@ -878,18 +889,18 @@ class ProjectSetup:
               f'for project {project}.')
 
       if not has_maintainer(info):
-        job.environment_string += 'DISABLE_DISCLOSURE = True\n'
+        environment_lines.append('DISABLE_DISCLOSURE = True\n')
 
       selective_unpack = info.get('selective_unpack')
       if selective_unpack:
-        job.environment_string += 'UNPACK_ALL_FUZZ_TARGETS_AND_FILES = False\n'
+        environment_lines.append('UNPACK_ALL_FUZZ_TARGETS_AND_FILES = False\n')
 
       main_repo = info.get('main_repo')
       if main_repo:
-        job.environment_string += f'MAIN_REPO = {main_repo}\n'
+        environment_lines.append(f'MAIN_REPO = {main_repo}\n')
 
       file_github_issue = info.get('file_github_issue', False)
-      job.environment_string += f'FILE_GITHUB_ISSUE = {file_github_issue}\n'
+      environment_lines.append(f'FILE_GITHUB_ISSUE = {file_github_issue}\n')
 
       # Device-specific queues created during project setup.
       queue_id = info.get('queue_id', False)
@@ -911,12 +922,17 @@ class ProjectSetup:
         additional_vars.update(engine_sanitizer_vars)
 
         for key, value in sorted(additional_vars.items()):
-          job.environment_string += (
+          environment_lines.append(
               f'{key} = {str(value).encode("unicode-escape").decode("utf-8")}\n'
           )
 
-      job.put()
+      job.environment_string = ''.join(environment_lines)
+      jobs_to_put[job_name] = job
 
+    # Write jobs before the fuzzer mappings that reference them, so a failure
+    # part way through never leaves fuzzers mapped to jobs that don't exist.
+    ndb_utils.put_multi(list(jobs_to_put.values()))
+    ndb_utils.put_multi(list(fuzzers_to_put.values()))
     return job_names
 
   def sync_user_permissions(self, project, info):
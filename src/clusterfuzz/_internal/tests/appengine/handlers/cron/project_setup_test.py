@@ -13,15 +13,14 @@
 # limitations under the License.
 """Tests for project_setup."""
 import ast
-import copy
+import functools
 import json
 import os
-import posixpath
 import unittest
 from unittest import mock
 
 from google.cloud import ndb
-import googleapiclient
+from googleapiclient import errors
 
 from clusterfuzz._internal.base import utils
 from clusterfuzz._internal.cron import project_setup
@@ -33,310 +32,134 @@ from clusterfuzz._internal.tests.test_libs import test_utils
 
 DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), 'project_setup_data')
 
-EXISTING_BUCKETS = {'lib1-logs.clusterfuzz-external.appspot.com'}
-
-
-def _read_data_file(data_file):
-  """Helper function to read the contents of a data file."""
-  with open(
-      os.path.join(DATA_DIRECTORY, data_file), encoding='utf-8') as handle:
-    return handle.read()
-
-
-class MockRequest:
-  """Mock API request."""
-
-  def __init__(self, raise_exception=False, return_value=None):
-    self.raise_exception = raise_exception
-    self.return_value = return_value
-
-  def execute(self):
-    """Mock execute()."""
-    if self.raise_exception:
-      raise googleapiclient.errors.HttpError(mock.Mock(status=404), b'')
-
-    return self.return_value
-
-
-def mock_bucket_get(bucket=None):
-  """Mock buckets().get()."""
-  if bucket in EXISTING_BUCKETS:
-    return MockRequest(False, {'name': 'bucket'})
-
-  return MockRequest(True)
-
-
-def mock_get_iam_policy(bucket=None):
-  """Mock buckets().getIamPolicy()."""
-  response = {
-      'kind': 'storage#policy',
-      'resourceId': 'fake',
-      'bindings': [],
-      'etag': 'fake'
-  }
-
-  if bucket in ('lib1-logs.clusterfuzz-external.appspot.com',
-                'lib3-logs.clusterfuzz-external.appspot.com'):
-    response['bindings'].append({
-        'role': 'roles/storage.objectViewer',
-        'members': ['user:user@example.com',]
-    })
-
-  return MockRequest(return_value=response)
-
-
-class CopyingMock(mock.MagicMock):
-  """MagicMock that copies arguments."""
-
-  def __call__(self, *args, **kwargs):
-    args = copy.deepcopy(args)
-    kwargs = copy.deepcopy(kwargs)
-    return super().__call__(*args, **kwargs)
-
-
-def mock_set_iam_policy(bucket=None, body=None):  # pylint: disable=unused-argument
-  """Mock buckets().setIamPolicy()."""
-  bindings = body['bindings']
-  if bindings and 'user:primary@example.com' in bindings[0]['members']:
-    return MockRequest(raise_exception=True)
-
-  return MockRequest(return_value=copy.deepcopy(body))
-
-
-def _mock_get_or_create_service_account(project):
-  return {
-      'email': project + '@serviceaccount.com',
-  }, False
-
-
-@test_utils.with_cloud_emulators('datastore', 'pubsub')
-class OssFuzzProjectSetupTest(unittest.TestCase):
-  """Test project_setup for OSS-Fuzz."""
-
-  def setUp(self):
-    self.maxDiff = None
-
-    helpers.patch_environ(self)
-
-    data_types.Job(
-        name='libfuzzer_asan_old_job',
-        environment_string=('MANAGED = True\n'
-                            'PROJECT_NAME = old\n')).put()
-    data_types.Job(
-        name='libfuzzer_msan_old_job',
-        environment_string=('MANAGED = True\n'
-                            'PROJECT_NAME = old\n')).put()
-    data_types.Job(
-        name='afl_asan_old_job',
-        environment_string=('MANAGED = True\n'
-                            'PROJECT_NAME = old\n')).put()
-    data_types.Job(
-        name='afl_msan_old_job',
-        environment_string=('MANAGED = True\n'
-                            'PROJECT_NAME = old\n')).put()
-    data_types.Job(name='unmanaged_job', environment_string='').put()
-
-    # Will be removed.
-    data_types.ExternalUserPermission(
-        entity_kind=data_types.PermissionEntityKind.JOB,
-        is_prefix=False,
-        auto_cc=data_types.AutoCCType.ALL,
-        entity_name='libfuzzer_asan_lib1',
-        email='willberemoved@example.com').put()
-
-    # Existing CC. Makes sure no duplicates are created.
-    data_types.ExternalUserPermission(
-        entity_kind=data_types.PermissionEntityKind.JOB,
-        is_prefix=False,
-        auto_cc=data_types.AutoCCType.ALL,
-        entity_name='libfuzzer_asan_lib1',
-        email='primary@example.com').put()
-
-    # Existing project settings. Should not get modified.
-    data_types.OssFuzzProject(id='lib1', name='lib1', cpu_weight=1.5).put()
-
-    # Should get deleted.
-    data_types.OssFuzzProject(id='old_lib', name='old_lib').put()
-
-    self.libfuzzer = data_types.Fuzzer(name='libFuzzer', jobs=[])
-    self.libfuzzer.data_bundle_name = 'global'
-    self.libfuzzer.jobs = ['libfuzzer_asan_old_job', 'libfuzzer_msan_old_job']
-    self.libfuzzer.put()
-
-    self.afl = data_types.Fuzzer(name='afl', jobs=[])
-    self.afl.data_bundle_name = 'global'
-    self.afl.jobs = ['afl_asan_old_job', 'afl_msan_old_job']
-    self.afl.put()
-
-    self.honggfuzz = data_types.Fuzzer(name='honggfuzz', jobs=[])
-    self.honggfuzz.data_bundle_name = 'global'
-    self.honggfuzz.put()
-
-    self.gft = data_types.Fuzzer(name='googlefuzztest', jobs=[])
-    self.gft.put()
-
-    self.centipede = data_types.Fuzzer(name='centipede', jobs=[])
-    self.centipede.data_bundle_name = 'global'
-    self.centipede.put()
-
-    helpers.patch(self, [
-        'clusterfuzz._internal.config.local_config.ProjectConfig',
-        ('get_application_id_2',
-         'clusterfuzz._internal.base.utils.get_application_id'),
-        'clusterfuzz._internal.google_cloud_utils.storage.build',
-        'time.sleep',
-        'handlers.base_handler.Handler.is_cron',
-        'clusterfuzz._internal.cron.project_setup.get_oss_fuzz_projects',
-        'clusterfuzz._internal.cron.service_accounts.get_or_create_service_account',
-        'clusterfuzz._internal.cron.service_accounts.set_service_account_roles',
-    ])
-
-    self.mock.get_or_create_service_account.side_effect = (
-        _mock_get_or_create_service_account)
-
-    self.mock.ProjectConfig.return_value = mock_config.MockConfig({
-        'segregate_projects':
-            True,
-        'project_setup': [{
-            'source': 'oss-fuzz',
-            'build_type': 'RELEASE_BUILD_BUCKET_PATH',
-            'add_info_labels': True,
-            'add_revision_mappings': True,
-            'build_buckets': {
-                'afl': 'clusterfuzz-builds-afl',
-                'centipede': 'clusterfuzz-builds-centipede',
-                'honggfuzz': 'clusterfuzz-builds-honggfuzz',
-                'libfuzzer': 'clusterfuzz-builds',
-                'libfuzzer_i386': 'clusterfuzz-builds-i386',
-                'no_engine': 'clusterfuzz-builds-no-engine',
-            }
-        }]
-    })
-
-  def test_execute(self):
-    """Tests executing of cron job."""
-    mock_storage = mock.MagicMock()
-    mock_storage.buckets().insert().execute.return_value = 'timeCreated'
-    self.mock.get_application_id_2.return_value = 'clusterfuzz-external'
-    self.mock.build.return_value = mock_storage
-
-    pubsub_client = pubsub.PubSubClient()
-    app_id = utils.get_application_id()
-    unmanaged_topic_name = pubsub.topic_name(app_id, 'jobs-linux')
-    old_topic_name = pubsub.topic_name(app_id, 'jobs-shouldbedeleted')
-    old_subscription_name = pubsub.subscription_name(app_id,
-                                                     'jobs-shouldbedeleted')
-    other_topic_name = pubsub.topic_name(app_id, 'other')
-
-    pubsub_client.create_topic(unmanaged_topic_name)
-    pubsub_client.create_topic(old_topic_name)
-    pubsub_client.create_topic(other_topic_name)
-    pubsub_client.create_subscription(old_subscription_name, old_topic_name)
-
-    self.mock.get_oss_fuzz_projects.return_value = [
-        ('lib1', {
-            'homepage': 'http://example.com',
-            'primary_contact': 'primary@example.com',
-            'auto_ccs': [
-                'User@example.com',
-                'user2@googlemail.com',
-            ],
-            'vendor_ccs': None,
-        }),
-        ('lib2', {
-            'homepage': 'http://example2.com',
-            'disabled': True,
-            'fuzzing_engines': ['libfuzzer',],
-        }),
-        ('lib3', {
-            'homepage':
-                'http://example3.com',
-            'sanitizers': [
-                'address',
-                {
-                    'memory': {
-                        'experimental': True,
-                    },
+EXISTING_BUCKETS = frozenset({'lib1-logs.clusterfuzz-external.appspot.com'})
+
+# Per-project bucket types in creation order, with the age in days after which
+# objects are deleted (None for no lifecycle rule).
+BUCKET_LIFECYCLE_AGES = (
+    ('backup', 100),
+    ('corpus', None),
+    ('quarantine', 90),
+    ('logs', 14),
+)
+
+# Buckets whose IAM policy already grants user@example.com read access.
+BUCKETS_WITH_IAM_POLICY = frozenset({
+    'lib1-logs.clusterfuzz-external.appspot.com',
+    'lib3-logs.clusterfuzz-external.appspot.com',
+})
+
+OSS_FUZZ_PROJECT_CONFIG = {
+    'segregate_projects':
+        True,
+    'project_setup': [{
+        'source': 'oss-fuzz',
+        'build_type': 'RELEASE_BUILD_BUCKET_PATH',
+        'add_info_labels': True,
+        'add_revision_mappings': True,
+        'build_buckets': {
+            'afl': 'clusterfuzz-builds-afl',
+            'centipede': 'clusterfuzz-builds-centipede',
+            'honggfuzz': 'clusterfuzz-builds-honggfuzz',
+            'libfuzzer': 'clusterfuzz-builds',
+            'libfuzzer_i386': 'clusterfuzz-builds-i386',
+            'no_engine': 'clusterfuzz-builds-no-engine',
+        }
+    }]
+}
+
+OSS_FUZZ_PROJECTS = (
+    ('lib1', {
+        'homepage': 'http://example.com',
+        'primary_contact': 'primary@example.com',
+        'auto_ccs': [
+            'User@example.com',
+            'user2@googlemail.com',
+        ],
+        'vendor_ccs': None,
+    }),
+    ('lib2', {
+        'homepage': 'http://example2.com',
+        'disabled': True,
+        'fuzzing_engines': ['libfuzzer',],
+    }),
+    ('lib3', {
+        'homepage':
+            'http://example3.com',
+        'sanitizers': [
+            'address',
+            {
+                'memory': {
+                    'experimental': True,
                 },
-                'undefined',
-            ],
-            'auto_ccs':
-                'User@example.com',
-            'disabled':
-                False,
-            'fuzzing_engines': ['libfuzzer',],
-            'view_restrictions':
-                'none',
-            'architectures': ['i386', 'x86_64'],
-        }),
-        ('lib4', {
-            'homepage': 'http://example4.com',
-            'language': 'go',
-            'sanitizers': ['address'],
-            'auto_ccs': 'User@example.com',
-            'fuzzing_engines': ['none'],
-            'blackbox': True,
-        }),
-        ('lib5', {
-            'homepage': 'http://example5.com',
-            'sanitizers': ['address'],
-            'fuzzing_engines': ['libfuzzer',],
-            'experimental': True,
-            'selective_unpack': True,
-            'main_repo': 'https://github.com/google/main-repo',
-        }),
-        ('lib6', {
-            'homepage': 'http://example6.com',
-            'sanitizers': ['address', 'memory', 'undefined'],
-            'fuzzing_engines': ['libfuzzer', 'afl'],
-            'auto_ccs': 'User@example.com',
-            'vendor_ccs': ['vendor1@example.com', 'vendor2@example.com'],
-        }),
-        ('lib7', {
-            'homepage': 'http://example.com',
-            'primary_contact': 'primary@example.com',
-            'auto_ccs': ['User@example.com',],
-            'fuzzing_engines': ['libfuzzer',],
-            'sanitizers': ['address'],
-            'labels': {
-                '*': ['custom'],
-                'per-target': ['ignore']
             },
-        }),
-        ('lib8', {
-            'homepage': 'http://example.com',
-            'primary_contact': 'primary@example.com',
-            'auto_ccs': ['User@example.com',],
-            'fuzzing_engines': ['libfuzzer',],
-            'sanitizers': ['none'],
-            'architectures': ['i386', 'x86_64'],
-        }),
-        ('lib9', {
-            'homepage:': 'http://example.com',
-            'primary_contact': 'primary@example.com',
-            'auto_ccs': ['User@example.com',],
-            'main_repo': 'https://github.com/google/main-repo',
-            'fuzzing_engines': ['centipede',],
-            'sanitizers:': ['address',],
-            'architectures': ['x86_64',],
-        }),
-    ]
-
-    mock_storage.buckets().get.side_effect = mock_bucket_get
-    mock_storage.buckets().getIamPolicy.side_effect = mock_get_iam_policy
-    mock_storage.buckets().setIamPolicy = CopyingMock()
-    mock_storage.buckets().setIamPolicy.side_effect = mock_set_iam_policy
-
-    project_setup.main()
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_asan_lib1').get()
-    self.assertIsNotNone(job)
-    self.assertEqual(job.project, 'lib1')
-    self.assertEqual(job.platform, 'LIB1_LINUX')
-    self.assertCountEqual(job.templates, ['engine_asan', 'libfuzzer', 'prune'])
-    self.assertEqual(
-        job.environment_string, 'RELEASE_BUILD_BUCKET_PATH = '
+            'undefined',
+        ],
+        'auto_ccs':
+            'User@example.com',
+        'disabled':
+            False,
+        'fuzzing_engines': ['libfuzzer',],
+        'view_restrictions':
+            'none',
+        'architectures': ['i386', 'x86_64'],
+    }),
+    ('lib4', {
+        'homepage': 'http://example4.com',
+        'language': 'go',
+        'sanitizers': ['address'],
+        'auto_ccs': 'User@example.com',
+        'fuzzing_engines': ['none'],
+        'blackbox': True,
+    }),
+    ('lib5', {
+        'homepage': 'http://example5.com',
+        'sanitizers': ['address'],
+        'fuzzing_engines': ['libfuzzer',],
+        'experimental': True,
+        'selective_unpack': True,
+        'main_repo': 'https://github.com/google/main-repo',
+    }),
+    ('lib6', {
+        'homepage': 'http://example6.com',
+        'sanitizers': ['address', 'memory', 'undefined'],
+        'fuzzing_engines': ['libfuzzer', 'afl'],
+        'auto_ccs': 'User@example.com',
+        'vendor_ccs': ['vendor1@example.com', 'vendor2@example.com'],
+    }),
+    ('lib7', {
+        'homepage': 'http://example.com',
+        'primary_contact': 'primary@example.com',
+        'auto_ccs': ['User@example.com',],
+        'fuzzing_engines': ['libfuzzer',],
+        'sanitizers': ['address'],
+        'labels': {
+            '*': ['custom'],
+            'per-target': ['ignore']
+        },
+    }),
+    ('lib8', {
+        'homepage': 'http://example.com',
+        'primary_contact': 'primary@example.com',
+        'auto_ccs': ['User@example.com',],
+        'fuzzing_engines': ['libfuzzer',],
+        'sanitizers': ['none'],
+        'architectures': ['i386', 'x86_64'],
+    }),
+    ('lib9', {
+        'homepage:': 'http://example.com',
+        'primary_contact': 'primary@example.com',
+        'auto_ccs': ['User@example.com',],
+        'main_repo': 'https://github.com/google/main-repo',
+        'fuzzing_engines': ['centipede',],
+        'sanitizers:': ['address',],
+        'architectures': ['x86_64',],
+    }),
+)
+
+EXPECTED_OSS_FUZZ_ENVIRONMENTS = {
+    'libfuzzer_asan_lib1': (
+        'RELEASE_BUILD_BUCKET_PATH = '
         'gs://clusterfuzz-builds/lib1/lib1-address-([0-9]+).zip\n'
         'PROJECT_NAME = lib1\n'
         'SUMMARY_PREFIX = lib1\n'
@@ -348,20 +171,9 @@ class OssFuzzProjectSetupTest(unittest.TestCase):
         'QUARANTINE_BUCKET = lib1-quarantine.clusterfuzz-external.appspot.com\n'
         'BACKUP_BUCKET = lib1-backup.clusterfuzz-external.appspot.com\n'
         'AUTOMATIC_LABELS = Proj-lib1,Engine-libfuzzer\n'
-        'FILE_GITHUB_ISSUE = False\n')
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_asan_lib2').get()
-    self.assertIsNone(job)
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_asan_lib3').get()
-    self.assertIsNotNone(job)
-    self.assertEqual(job.project, 'lib3')
-    self.assertEqual(job.platform, 'LIB3_LINUX')
-    self.assertCountEqual(job.templates, ['engine_asan', 'libfuzzer', 'prune'])
-    self.assertEqual(
-        job.environment_string, 'RELEASE_BUILD_BUCKET_PATH = '
+        'FILE_GITHUB_ISSUE = False\n'),
+    'libfuzzer_asan_lib3': (
+        'RELEASE_BUILD_BUCKET_PATH = '
         'gs://clusterfuzz-builds/lib3/lib3-address-([0-9]+).zip\n'
         'PROJECT_NAME = lib3\n'
         'SUMMARY_PREFIX = lib3\n'
@@ -374,16 +186,9 @@ class OssFuzzProjectSetupTest(unittest.TestCase):
         'BACKUP_BUCKET = lib3-backup.clusterfuzz-external.appspot.com\n'
         'AUTOMATIC_LABELS = Proj-lib3,Engine-libfuzzer\n'
         'ISSUE_VIEW_RESTRICTIONS = none\n'
-        'FILE_GITHUB_ISSUE = False\n')
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_asan_i386_lib3').get()
-    self.assertIsNotNone(job)
-    self.assertEqual(job.project, 'lib3')
-    self.assertEqual(job.platform, 'LIB3_LINUX')
-    self.assertCountEqual(job.templates, ['engine_asan', 'libfuzzer'])
-    self.assertEqual(
-        job.environment_string, 'RELEASE_BUILD_BUCKET_PATH = '
+        'FILE_GITHUB_ISSUE = False\n'),
+    'libfuzzer_asan_i386_lib3': (
+        'RELEASE_BUILD_BUCKET_PATH = '
         'gs://clusterfuzz-builds-i386/lib3/lib3-address-([0-9]+).zip\n'
         'PROJECT_NAME = lib3\n'
         'SUMMARY_PREFIX = lib3\n'
@@ -396,16 +201,9 @@ class OssFuzzProjectSetupTest(unittest.TestCase):
         'BACKUP_BUCKET = lib3-backup.clusterfuzz-external.appspot.com\n'
         'AUTOMATIC_LABELS = Proj-lib3,Engine-libfuzzer\n'
         'ISSUE_VIEW_RESTRICTIONS = none\n'
-        'FILE_GITHUB_ISSUE = False\n')
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_msan_lib3').get()
-    self.assertIsNotNone(job)
-    self.assertEqual(job.project, 'lib3')
-    self.assertEqual(job.platform, 'LIB3_LINUX')
-    self.assertCountEqual(job.templates, ['engine_msan', 'libfuzzer'])
-    self.assertEqual(
-        job.environment_string, 'RELEASE_BUILD_BUCKET_PATH = '
+        'FILE_GITHUB_ISSUE = False\n'),
+    'libfuzzer_msan_lib3': (
+        'RELEASE_BUILD_BUCKET_PATH = '
         'gs://clusterfuzz-builds/lib3/lib3-memory-([0-9]+).zip\n'
         'PROJECT_NAME = lib3\n'
         'SUMMARY_PREFIX = lib3\n'
@@ -419,16 +217,9 @@ class OssFuzzProjectSetupTest(unittest.TestCase):
         'AUTOMATIC_LABELS = Proj-lib3,Engine-libfuzzer\n'
         'EXPERIMENTAL = True\n'
         'ISSUE_VIEW_RESTRICTIONS = none\n'
-        'FILE_GITHUB_ISSUE = False\n')
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_ubsan_lib3').get()
-    self.assertIsNotNone(job)
-    self.assertEqual(job.project, 'lib3')
-    self.assertEqual(job.platform, 'LIB3_LINUX')
-    self.assertCountEqual(job.templates, ['engine_ubsan', 'libfuzzer'])
-    self.assertEqual(
-        job.environment_string, 'RELEASE_BUILD_BUCKET_PATH = '
+        'FILE_GITHUB_ISSUE = False\n'),
+    'libfuzzer_ubsan_lib3': (
+        'RELEASE_BUILD_BUCKET_PATH = '
         'gs://clusterfuzz-builds/lib3/lib3-undefined-([0-9]+).zip\n'
         'PROJECT_NAME = lib3\n'
         'SUMMARY_PREFIX = lib3\n'
@@ -441,15 +232,9 @@ class OssFuzzProjectSetupTest(unittest.TestCase):
         'BACKUP_BUCKET = lib3-backup.clusterfuzz-external.appspot.com\n'
         'AUTOMATIC_LABELS = Proj-lib3,Engine-libfuzzer\n'
         'ISSUE_VIEW_RESTRICTIONS = none\n'
-        'FILE_GITHUB_ISSUE = False\n')
-
-    job = data_types.Job.query(data_types.Job.name == 'afl_asan_lib1').get()
-    self.assertIsNotNone(job)
-    self.assertEqual(job.project, 'lib1')
-    self.assertEqual(job.platform, 'LIB1_LINUX')
-    self.assertCountEqual(job.templates, ['engine_asan', 'afl'])
-    self.assertEqual(
-        job.environment_string, 'RELEASE_BUILD_BUCKET_PATH = '
+        'FILE_GITHUB_ISSUE = False\n'),
+    'afl_asan_lib1': (
+        'RELEASE_BUILD_BUCKET_PATH = '
         'gs://clusterfuzz-builds-afl/lib1/lib1-address-([0-9]+).zip\n'
         'PROJECT_NAME = lib1\n'
         'SUMMARY_PREFIX = lib1\n'
@@ -462,18 +247,9 @@ class OssFuzzProjectSetupTest(unittest.TestCase):
         'BACKUP_BUCKET = lib1-backup.clusterfuzz-external.appspot.com\n'
         'AUTOMATIC_LABELS = Proj-lib1,Engine-afl\n'
         'MINIMIZE_JOB_OVERRIDE = libfuzzer_asan_lib1\n'
-        'FILE_GITHUB_ISSUE = False\n')
-
-    # Engine-less job. Manually managed.
-    job = data_types.Job.query(data_types.Job.name == 'asan_lib4').get()
-    self.assertIsNone(job)
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_asan_lib5').get()
-    self.assertEqual(job.project, 'lib5')
-    self.assertEqual(job.platform, 'LIB5_LINUX')
-    self.assertEqual(
-        job.environment_string, 'RELEASE_BUILD_BUCKET_PATH = '
+        'FILE_GITHUB_ISSUE = False\n'),
+    'libfuzzer_asan_lib5': (
+        'RELEASE_BUILD_BUCKET_PATH = '
         'gs://clusterfuzz-builds/lib5/lib5-address-([0-9]+).zip\n'
         'PROJECT_NAME = lib5\n'
         'SUMMARY_PREFIX = lib5\n'
@@ -489,14 +265,9 @@ class OssFuzzProjectSetupTest(unittest.TestCase):
         'DISABLE_DISCLOSURE = True\n'
         'UNPACK_ALL_FUZZ_TARGETS_AND_FILES = False\n'
         'MAIN_REPO = https://github.com/google/main-repo\n'
-        'FILE_GITHUB_ISSUE = False\n')
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_asan_lib6').get()
-    self.assertEqual(job.project, 'lib6')
-    self.assertEqual(job.platform, 'LIB6_LINUX')
-    self.assertEqual(
-        job.environment_string, 'RELEASE_BUILD_BUCKET_PATH = '
+        'FILE_GITHUB_ISSUE = False\n'),
+    'libfuzzer_asan_lib6': (
+        'RELEASE_BUILD_BUCKET_PATH = '
         'gs://clusterfuzz-builds/lib6/lib6-address-([0-9]+).zip\n'
         'PROJECT_NAME = lib6\n'
         'SUMMARY_PREFIX = lib6\n'
@@ -508,16 +279,9 @@ class OssFuzzProjectSetupTest(unittest.TestCase):
         'QUARANTINE_BUCKET = lib6-quarantine.clusterfuzz-external.appspot.com\n'
         'BACKUP_BUCKET = lib6-backup.clusterfuzz-external.appspot.com\n'
         'AUTOMATIC_LABELS = Proj-lib6,Engine-libfuzzer\n'
-        'FILE_GITHUB_ISSUE = False\n')
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_asan_lib7').get()
-    self.assertIsNotNone(job)
-    self.assertEqual(job.project, 'lib7')
-    self.assertEqual(job.platform, 'LIB7_LINUX')
-    self.assertCountEqual(job.templates, ['engine_asan', 'libfuzzer', 'prune'])
-    self.assertEqual(
-        job.environment_string, 'RELEASE_BUILD_BUCKET_PATH = '
+        'FILE_GITHUB_ISSUE = False\n'),
+    'libfuzzer_asan_lib7': (
+        'RELEASE_BUILD_BUCKET_PATH = '
         'gs://clusterfuzz-builds/lib7/lib7-address-([0-9]+).zip\n'
         'PROJECT_NAME = lib7\n'
         'SUMMARY_PREFIX = lib7\n'
@@ -529,16 +293,9 @@ class OssFuzzProjectSetupTest(unittest.TestCase):
         'QUARANTINE_BUCKET = lib7-quarantine.clusterfuzz-external.appspot.com\n'
         'BACKUP_BUCKET = lib7-backup.clusterfuzz-external.appspot.com\n'
         'AUTOMATIC_LABELS = Proj-lib7,Engine-libfuzzer,custom\n'
-        'FILE_GITHUB_ISSUE = False\n')
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'centipede_asan_lib9').get()
-    self.assertIsNotNone(job)
-    self.assertEqual(job.project, 'lib9')
-    self.assertEqual(job.platform, 'LIB9_LINUX')
-    self.assertCountEqual(job.templates, ['engine_asan', 'centipede'])
-    self.assertEqual(
-        job.environment_string, 'RELEASE_BUILD_BUCKET_PATH = '
+        'FILE_GITHUB_ISSUE = False\n'),
+    'centipede_asan_lib9': (
+        'RELEASE_BUILD_BUCKET_PATH = '
         'gs://clusterfuzz-builds-centipede/lib9/lib9-none-([0-9]+).zip\n'
         'PROJECT_NAME = lib9\n'
         'SUMMARY_PREFIX = lib9\n'
@@ -553,12 +310,280 @@ class OssFuzzProjectSetupTest(unittest.TestCase):
         'BACKUP_BUCKET = lib9-backup.clusterfuzz-external.appspot.com\n'
         'AUTOMATIC_LABELS = Proj-lib9,Engine-centipede\n'
         'MAIN_REPO = https://github.com/google/main-repo\n'
-        'FILE_GITHUB_ISSUE = False\n')
+        'FILE_GITHUB_ISSUE = False\n'),
+}
+
+# Expected (project, platform, templates) for each managed OSS-Fuzz job. A
+# templates value of None means the templates are not checked.
+EXPECTED_OSS_FUZZ_JOBS = {
+    'libfuzzer_asan_lib1': ('lib1', 'LIB1_LINUX',
+                            ['engine_asan', 'libfuzzer', 'prune']),
+    'libfuzzer_asan_lib3': ('lib3', 'LIB3_LINUX',
+                            ['engine_asan', 'libfuzzer', 'prune']),
+    'libfuzzer_asan_i386_lib3': ('lib3', 'LIB3_LINUX',
+                                 ['engine_asan', 'libfuzzer']),
+    'libfuzzer_msan_lib3': ('lib3', 'LIB3_LINUX', ['engine_msan', 'libfuzzer']),
+    'libfuzzer_ubsan_lib3': ('lib3', 'LIB3_LINUX',
+                             ['engine_ubsan', 'libfuzzer']),
+    'afl_asan_lib1': ('lib1', 'LIB1_LINUX', ['engine_asan', 'afl']),
+    'libfuzzer_asan_lib5': ('lib5', 'LIB5_LINUX', None),
+    'libfuzzer_asan_lib6': ('lib6', 'LIB6_LINUX', None),
+    'libfuzzer_asan_lib7': ('lib7', 'LIB7_LINUX',
+                            ['engine_asan', 'libfuzzer', 'prune']),
+    'centipede_asan_lib9': ('lib9', 'LIB9_LINUX', ['engine_asan', 'centipede']),
+}
+
+
+def _read_data_file(data_file):
+  """Helper function to read the contents of a data file."""
+  with open(
+      os.path.join(DATA_DIRECTORY, data_file), encoding='utf-8') as handle:
+    return handle.read()
+
+
+class MockRequest:
+  """Mock API request."""
+
+  def __init__(self, raise_exception=False, return_value=None):
+    self.raise_exception = raise_exception
+    self.return_value = return_value
+
+  def execute(self):
+    """Mock execute()."""
+    if self.raise_exception:
+      raise errors.HttpError(mock.Mock(status=404), b'')
+
+    return self.return_value
+
+
+# Stateless request that fails with a 404, shared by all mocks.
+_NOT_FOUND = MockRequest(raise_exception=True)
+
+
+def _iam_policy(bindings):
+  """Return a storage IAM policy body with the given bindings."""
+  return {
+      'kind': 'storage#policy',
+      'resourceId': 'fake',
+      'bindings': bindings,
+      'etag': 'fake'
+  }
+
+
+def _bucket_lifecycle(name, age):
+  """Return a bucket insert body that deletes objects older than |age| days."""
+  return {
+      'name': name,
+      'lifecycle': {
+          'rule': [{
+              'action': {
+                  'type': 'Delete'
+              },
+              'condition': {
+                  'age': age
+              }
+          }]
+      }
+  }
+
+
+def mock_bucket_get(bucket=None):
+  """Mock buckets().get()."""
+  if bucket in EXISTING_BUCKETS:
+    return MockRequest(False, {'name': 'bucket'})
+
+  return _NOT_FOUND
+
+
+def mock_get_iam_policy(bucket=None):
+  """Mock buckets().getIamPolicy()."""
+  response = _iam_policy([])
+
+  if bucket in BUCKETS_WITH_IAM_POLICY:
+    response['bindings'].append({
+        'role': 'roles/storage.objectViewer',
+        'members': ['user:user@example.com',]
+    })
+
+  return MockRequest(return_value=response)
+
+
+class CopyingMock(mock.MagicMock):
+  """MagicMock that copies arguments."""
+
+  def __call__(self, *args, **kwargs):
+    # Arguments are JSON-like API request bodies, so a JSON round trip is a
+    # cheaper deep copy than copy.deepcopy.
+    args = json.loads(json.dumps(args))
+    kwargs = json.loads(json.dumps(kwargs))
+    return super().__call__(*args, **kwargs)
+
+
+def _copy_iam_policy(iam_policy):
+  """Copy an IAM policy, duplicating only the bindings that callers mutate."""
+  iam_policy = dict(iam_policy)
+  iam_policy['bindings'] = [
+      dict(binding, members=list(binding['members']))
+      for binding in iam_policy['bindings']
+  ]
+  return iam_policy
+
+
+def mock_set_iam_policy(bucket=None, body=None):  # pylint: disable=unused-argument
+  """Mock buckets().setIamPolicy()."""
+  bindings = body['bindings']
+  if bindings and 'user:primary@example.com' in bindings[0]['members']:
+    return _NOT_FOUND
+
+  return MockRequest(return_value=_copy_iam_policy(body))
+
+
+def _mock_get_or_create_service_account(project):
+  return {
+      'email': project + '@serviceaccount.com',
+  }, False
+
+
+@test_utils.with_cloud_emulators('datastore', 'pubsub')
+class OssFuzzProjectSetupTest(unittest.TestCase):
+  """Test project_setup for OSS-Fuzz."""
+
+  def setUp(self):
+    self.maxDiff = None
+
+    helpers.patch_environ(self)
+
+    self.libfuzzer = data_types.Fuzzer(name='libFuzzer', jobs=[])
+    self.libfuzzer.data_bundle_name = 'global'
+    self.libfuzzer.jobs = ['libfuzzer_asan_old_job', 'libfuzzer_msan_old_job']
+
+    self.afl = data_types.Fuzzer(name='afl', jobs=[])
+    self.afl.data_bundle_name = 'global'
+    self.afl.jobs = ['afl_asan_old_job', 'afl_msan_old_job']
+
+    self.honggfuzz = data_types.Fuzzer(name='honggfuzz', jobs=[])
+    self.honggfuzz.data_bundle_name = 'global'
+
+    self.gft = data_types.Fuzzer(name='googlefuzztest', jobs=[])
+
+    self.centipede = data_types.Fuzzer(name='centipede', jobs=[])
+    self.centipede.data_bundle_name = 'global'
+
+    ndb.put_multi([
+        data_types.Job(
+            name='libfuzzer_asan_old_job',
+            environment_string=('MANAGED = True\n'
+                                'PROJECT_NAME = old\n')),
+        data_types.Job(
+            name='libfuzzer_msan_old_job',
+            environment_string=('MANAGED = True\n'
+                                'PROJECT_NAME = old\n')),
+        data_types.Job(
+            name='afl_asan_old_job',
+            environment_string=('MANAGED = True\n'
+                                'PROJECT_NAME = old\n')),
+        data_types.Job(
+            name='afl_msan_old_job',
+            environment_string=('MANAGED = True\n'
+                                'PROJECT_NAME = old\n')),
+        data_types.Job(name='unmanaged_job', environment_string=''),
+        # Will be removed.
+        data_types.ExternalUserPermission(
+            entity_kind=data_types.PermissionEntityKind.JOB,
+            is_prefix=False,
+            auto_cc=data_types.AutoCCType.ALL,
+            entity_name='libfuzzer_asan_lib1',
+            email='willberemoved@example.com'),
+        # Existing CC. Makes sure no duplicates are created.
+        data_types.ExternalUserPermission(
+            entity_kind=data_types.PermissionEntityKind.JOB,
+            is_prefix=False,
+            auto_cc=data_types.AutoCCType.ALL,
+            entity_name='libfuzzer_asan_lib1',
+            email='primary@example.com'),
+        # Existing project settings. Should not get modified.
+        data_types.OssFuzzProject(id='lib1', name='lib1', cpu_weight=1.5),
+        # Should get deleted.
+        data_types.OssFuzzProject(id='old_lib', name='old_lib'),
+        self.libfuzzer,
+        self.afl,
+        self.honggfuzz,
+        self.gft,
+        self.centipede,
+    ])
+
+    helpers.patch(self, [
+        'clusterfuzz._internal.config.local_config.ProjectConfig',
+        ('get_application_id_2',
+         'clusterfuzz._internal.base.utils.get_application_id'),
+        'clusterfuzz._internal.google_cloud_utils.storage.build',
+        'time.sleep',
+        'clusterfuzz._internal.cron.project_setup.get_oss_fuzz_projects',
+        'clusterfuzz._internal.cron.service_accounts.get_or_create_service_account',
+        'clusterfuzz._internal.cron.service_accounts.set_service_account_roles',
+    ])
+
+    self.mock.get_or_create_service_account.side_effect = (
+        _mock_get_or_create_service_account)
+
+    self.mock.ProjectConfig.return_value = mock_config.MockConfig(
+        OSS_FUZZ_PROJECT_CONFIG)
+
+  def test_execute(self):
+    """Tests executing of cron job."""
+    mock_storage = mock.MagicMock()
+    buckets = mock_storage.buckets.return_value
+    buckets.insert.return_value.execute.return_value = 'timeCreated'
+    self.mock.get_application_id_2.return_value = 'clusterfuzz-external'
+    self.mock.build.return_value = mock_storage
+
+    pubsub_client = pubsub.PubSubClient()
+    app_id = utils.get_application_id()
+    unmanaged_topic_name = pubsub.topic_name(app_id, 'jobs-linux')
+    old_topic_name = pubsub.topic_name(app_id, 'jobs-shouldbedeleted')
+    old_subscription_name = pubsub.subscription_name(app_id,
+                                                     'jobs-shouldbedeleted')
+    other_topic_name = pubsub.topic_name(app_id, 'other')
+
+    pubsub_client.create_topic(unmanaged_topic_name)
+    pubsub_client.create_topic(old_topic_name)
+    pubsub_client.create_topic(other_topic_name)
+    pubsub_client.create_subscription(old_subscription_name, old_topic_name)
+
+    self.mock.get_oss_fuzz_projects.return_value = OSS_FUZZ_PROJECTS
+
+    buckets.get.side_effect = mock_bucket_get
+    # getIamPolicy calls are never asserted on, so skip MagicMock call tracking.
+    buckets.getIamPolicy = mock_get_iam_policy
+    buckets.setIamPolicy = CopyingMock()
+    buckets.setIamPolicy.side_effect = mock_set_iam_policy
+
+    project_setup.main()
+
+    jobs = {job.name: job for job in data_types.Job.query()}
+
+    for name, (project, platform, templates) in EXPECTED_OSS_FUZZ_JOBS.items():
+      with self.subTest(job=name):
+        job = jobs.get(name)
+        self.assertIsNotNone(job)
+        self.assertEqual(job.project, project)
+        self.assertEqual(job.platform, platform)
+        if templates is not None:
+          self.assertCountEqual(job.templates, templates)
+        self.assertEqual(job.environment_string,
+                         EXPECTED_OSS_FUZZ_ENVIRONMENTS[name])
+
+    # Disabled project.
+    self.assertIsNone(jobs.get('libfuzzer_asan_lib2'))
+
+    # Engine-less job. Manually managed.
+    self.assertIsNone(jobs.get('asan_lib4'))
 
     self.maxDiff = None
 
-    libfuzzer = data_types.Fuzzer.query(
-        data_types.Fuzzer.name == 'libFuzzer').get()
+    fuzzers = {fuzzer.name: fuzzer for fuzzer in data_types.Fuzzer.query()}
+
+    libfuzzer = fuzzers.get('libFuzzer')
     self.assertCountEqual(libfuzzer.jobs, [
         'libfuzzer_asan_lib1',
         'libfuzzer_asan_lib3',
@@ -575,32 +600,28 @@ class OssFuzzProjectSetupTest(unittest.TestCase):
         'libfuzzer_nosanitizer_lib8',
     ])
 
-    afl = data_types.Fuzzer.query(data_types.Fuzzer.name == 'afl').get()
+    afl = fuzzers.get('afl')
     self.assertCountEqual(afl.jobs, [
         'afl_asan_lib1',
         'afl_asan_lib6',
     ])
 
-    centipede = data_types.Fuzzer.query(
-        data_types.Fuzzer.name == 'centipede').get()
-    self.assertCountEqual(centipede.jobs, [
-        'centipede_asan_lib9',
-    ])
+    centipede = fuzzers.get('centipede')
+    self.assertEqual(centipede.jobs, ['centipede_asan_lib9'])
 
     # Test that old unused jobs are deleted.
-    self.assertIsNone(
-        data_types.Job.query(
-            data_types.Job.name == 'libfuzzer_asan_old_job').get())
-    self.assertIsNone(
-        data_types.Job.query(
-            data_types.Job.name == 'libfuzzer_msan_old_job').get())
+    self.assertIsNone(jobs.get('libfuzzer_asan_old_job'))
+    self.assertIsNone(jobs.get('libfuzzer_msan_old_job'))
 
     # Unmanaged job should still exist.
-    self.assertIsNotNone(
-        data_types.Job.query(data_types.Job.name == 'unmanaged_job').get())
+    self.assertIsNotNone(jobs.get('unmanaged_job'))
 
     # Test that project settings are created.
-    lib1_settings = ndb.Key(data_types.OssFuzzProject, 'lib1').get()
+    (lib1_settings, lib2_settings, lib3_settings, lib4_settings,
+     old_lib_settings) = ndb.get_multi([
+         ndb.Key(data_types.OssFuzzProject, name)
+         for name in ('lib1', 'lib2', 'lib3', 'lib4', 'old_lib')
+     ])
     self.assertIsNotNone(lib1_settings)
     self.assertDictEqual({
         'cpu_weight':
@@ -618,10 +639,8 @@ class OssFuzzProjectSetupTest(unittest.TestCase):
         ],
     }, lib1_settings.to_dict())
 
-    lib2_settings = ndb.Key(data_types.OssFuzzProject, 'lib2').get()
     self.assertIsNone(lib2_settings)
 
-    lib3_settings = ndb.Key(data_types.OssFuzzProject, 'lib3').get()
     self.assertIsNotNone(lib3_settings)
     self.assertDictEqual({
         'cpu_weight': 1.0,
@@ -632,7 +651,6 @@ class OssFuzzProjectSetupTest(unittest.TestCase):
         'ccs': ['user@example.com'],
     }, lib3_settings.to_dict())
 
-    lib4_settings = ndb.Key(data_types.OssFuzzProject, 'lib4').get()
     self.assertIsNotNone(lib4_settings)
     self.assertDictEqual({
         'cpu_weight': 0.2,
@@ -643,10 +661,9 @@ class OssFuzzProjectSetupTest(unittest.TestCase):
         'ccs': ['user@example.com'],
     }, lib4_settings.to_dict())
 
-    old_lib_settings = ndb.Key(data_types.OssFuzzProject, 'old_lib').get()
     self.assertIsNone(old_lib_settings)
 
-    mock_storage.buckets().get.assert_has_calls([
+    buckets.get.assert_has_calls([
         mock.call(bucket='lib1-backup.clusterfuzz-external.appspot.com'),
         mock.call(bucket='lib1-corpus.clusterfuzz-external.appspot.com'),
         mock.call(bucket='lib1-quarantine.clusterfuzz-external.appspot.com'),
@@ -661,640 +678,243 @@ class OssFuzzProjectSetupTest(unittest.TestCase):
         mock.call(bucket='lib3-logs.clusterfuzz-external.appspot.com'),
     ])
 
-    mock_storage.buckets().insert.assert_has_calls([
-        mock.call(
-            body={
-                'name': 'lib1-backup.clusterfuzz-external.appspot.com',
-                'lifecycle': {
-                    'rule': [{
-                        'action': {
-                            'type': 'Delete'
-                        },
-                        'condition': {
-                            'age': 100
-                        }
-                    }]
-                }
-            },
-            project='clusterfuzz-external'),
-        mock.call().execute(),
-        mock.call(
-            body={'name': 'lib1-corpus.clusterfuzz-external.appspot.com'},
-            project='clusterfuzz-external'),
-        mock.call().execute(),
-        mock.call(
-            body={
-                'name': 'lib1-quarantine.clusterfuzz-external.appspot.com',
-                'lifecycle': {
-                    'rule': [{
-                        'action': {
-                            'type': 'Delete'
-                        },
-                        'condition': {
-                            'age': 90
-                        }
-                    }]
-                }
-            },
-            project='clusterfuzz-external'),
-        mock.call().execute(),
-        mock.call(
-            body={
-                'name': 'lib2-backup.clusterfuzz-external.appspot.com',
-                'lifecycle': {
-                    'rule': [{
-                        'action': {
-                            'type': 'Delete'
-                        },
-                        'condition': {
-                            'age': 100
-                        }
-                    }]
-                }
-            },
-            project='clusterfuzz-external'),
-        mock.call().execute(),
-        mock.call(
-            body={'name': 'lib2-corpus.clusterfuzz-external.appspot.com'},
-            project='clusterfuzz-external'),
-        mock.call().execute(),
-        mock.call(
-            body={
-                'name': 'lib2-quarantine.clusterfuzz-external.appspot.com',
-                'lifecycle': {
-                    'rule': [{
-                        'action': {
-                            'type': 'Delete'
-                        },
-                        'condition': {
-                            'age': 90
-                        }
-                    }]
-                }
-            },
-            project='clusterfuzz-external'),
-        mock.call().execute(),
-        mock.call(
-            body={
-                'name': 'lib2-logs.clusterfuzz-external.appspot.com',
-                'lifecycle': {
-                    'rule': [{
-                        'action': {
-                            'type': 'Delete'
-                        },
-                        'condition': {
-                            'age': 14
-                        }
-                    }]
-                }
-            },
-            project='clusterfuzz-external'),
-        mock.call().execute(),
-        mock.call(
-            body={
-                'name': 'lib3-backup.clusterfuzz-external.appspot.com',
-                'lifecycle': {
-                    'rule': [{
-                        'action': {
-                            'type': 'Delete'
-                        },
-                        'condition': {
-                            'age': 100
-                        }
-                    }]
-                }
-            },
-            project='clusterfuzz-external'),
-        mock.call().execute(),
-        mock.call(
-            body={'name': 'lib3-corpus.clusterfuzz-external.appspot.com'},
-            project='clusterfuzz-external'),
-        mock.call().execute(),
-        mock.call(
-            body={
-                'name': 'lib3-quarantine.clusterfuzz-external.appspot.com',
-                'lifecycle': {
-                    'rule': [{
-                        'action': {
-                            'type': 'Delete'
-                        },
-                        'condition': {
-                            'age': 90
-                        }
-                    }]
-                }
-            },
-            project='clusterfuzz-external'),
-        mock.call().execute(),
-        mock.call(
-            body={
-                'name': 'lib3-logs.clusterfuzz-external.appspot.com',
-                'lifecycle': {
-                    'rule': [{
-                        'action': {
-                            'type': 'Delete'
-                        },
-                        'condition': {
-                            'age': 14
-                        }
-                    }]
-                }
-            },
-            project='clusterfuzz-external'),
-        mock.call().execute(),
-    ])
+    expected_insert_calls = []
+    for project in ('lib1', 'lib2', 'lib3'):
+      for bucket_type, age in BUCKET_LIFECYCLE_AGES:
+        bucket = f'{project}-{bucket_type}.clusterfuzz-external.appspot.com'
+        if bucket in EXISTING_BUCKETS:
+          continue
+
+        body = _bucket_lifecycle(bucket, age) if age else {'name': bucket}
+        expected_insert_calls.append(
+            mock.call(body=body, project='clusterfuzz-external'))
+
+    # lib1-lib3 are set up first, so their buckets are the first inserted.
+    insert_calls = buckets.insert.call_args_list
+    self.assertEqual(expected_insert_calls,
+                     insert_calls[:len(expected_insert_calls)])
+    # Every inserted bucket request is executed.
+    self.assertEqual(
+        len(insert_calls), buckets.insert.return_value.execute.call_count)
 
-    mock_storage.buckets().setIamPolicy.assert_has_calls([
+    buckets.setIamPolicy.assert_has_calls([
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['user:primary@example.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:primary@example.com']
+            }]),
             bucket='lib1-backup.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['user:user2@gmail.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user2@gmail.com']
+            }]),
             bucket='lib1-backup.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': [
-                        'user:user2@gmail.com', 'user:user@example.com'
-                    ]
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user2@gmail.com', 'user:user@example.com']
+            }]),
             bucket='lib1-backup.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': [
-                        'user:user2@gmail.com', 'user:user@example.com'
-                    ]
-                }, {
-                    'role': 'roles/storage.objectAdmin',
-                    'members': ['serviceAccount:lib1@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user2@gmail.com', 'user:user@example.com']
+            }, {
+                'role': 'roles/storage.objectAdmin',
+                'members': ['serviceAccount:lib1@serviceaccount.com']
+            }]),
             bucket='lib1-backup.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['user:primary@example.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:primary@example.com']
+            }]),
             bucket='lib1-corpus.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['user:user2@gmail.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user2@gmail.com']
+            }]),
             bucket='lib1-corpus.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': [
-                        'user:user2@gmail.com', 'user:user@example.com'
-                    ]
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user2@gmail.com', 'user:user@example.com']
+            }]),
             bucket='lib1-corpus.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': [
-                        'user:user2@gmail.com', 'user:user@example.com'
-                    ]
-                }, {
-                    'role': 'roles/storage.objectAdmin',
-                    'members': ['serviceAccount:lib1@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user2@gmail.com', 'user:user@example.com']
+            }, {
+                'role': 'roles/storage.objectAdmin',
+                'members': ['serviceAccount:lib1@serviceaccount.com']
+            }]),
             bucket='lib1-corpus.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role':
-                        'roles/storage.objectViewer',
-                    'members': [
-                        'user:primary@example.com', 'user:user@example.com'
-                    ]
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': [
+                    'user:primary@example.com', 'user:user@example.com'
+                ]
+            }]),
             bucket='lib1-logs.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': [
-                        'user:user2@gmail.com', 'user:user@example.com'
-                    ]
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user2@gmail.com', 'user:user@example.com']
+            }]),
             bucket='lib1-logs.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': [
-                        'user:user2@gmail.com', 'user:user@example.com'
-                    ]
-                }, {
-                    'role': 'roles/storage.objectAdmin',
-                    'members': ['serviceAccount:lib1@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user2@gmail.com', 'user:user@example.com']
+            }, {
+                'role': 'roles/storage.objectAdmin',
+                'members': ['serviceAccount:lib1@serviceaccount.com']
+            }]),
             bucket='lib1-logs.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['user:primary@example.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:primary@example.com']
+            }]),
             bucket='lib1-quarantine.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['user:user2@gmail.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user2@gmail.com']
+            }]),
             bucket='lib1-quarantine.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': [
-                        'user:user2@gmail.com', 'user:user@example.com'
-                    ]
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user2@gmail.com', 'user:user@example.com']
+            }]),
             bucket='lib1-quarantine.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': [
-                        'user:user2@gmail.com', 'user:user@example.com'
-                    ]
-                }, {
-                    'role': 'roles/storage.objectAdmin',
-                    'members': ['serviceAccount:lib1@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user2@gmail.com', 'user:user@example.com']
+            }, {
+                'role': 'roles/storage.objectAdmin',
+                'members': ['serviceAccount:lib1@serviceaccount.com']
+            }]),
             bucket='lib1-quarantine.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['serviceAccount:lib1@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['serviceAccount:lib1@serviceaccount.com']
+            }]),
             bucket='clusterfuzz-external-deployment'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['serviceAccount:lib1@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['serviceAccount:lib1@serviceaccount.com']
+            }]),
             bucket='global-corpus.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectAdmin',
-                    'members': ['serviceAccount:lib2@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectAdmin',
+                'members': ['serviceAccount:lib2@serviceaccount.com']
+            }]),
             bucket='lib2-backup.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectAdmin',
-                    'members': ['serviceAccount:lib2@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectAdmin',
+                'members': ['serviceAccount:lib2@serviceaccount.com']
+            }]),
             bucket='lib2-corpus.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectAdmin',
-                    'members': ['serviceAccount:lib2@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectAdmin',
+                'members': ['serviceAccount:lib2@serviceaccount.com']
+            }]),
             bucket='lib2-logs.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectAdmin',
-                    'members': ['serviceAccount:lib2@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectAdmin',
+                'members': ['serviceAccount:lib2@serviceaccount.com']
+            }]),
             bucket='lib2-quarantine.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['serviceAccount:lib2@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['serviceAccount:lib2@serviceaccount.com']
+            }]),
             bucket='clusterfuzz-external-deployment'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['serviceAccount:lib2@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['serviceAccount:lib2@serviceaccount.com']
+            }]),
             bucket='global-corpus.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['user:user@example.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user@example.com']
+            }]),
             bucket='lib3-backup.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['user:user@example.com']
-                }, {
-                    'role': 'roles/storage.objectAdmin',
-                    'members': ['serviceAccount:lib3@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user@example.com']
+            }, {
+                'role': 'roles/storage.objectAdmin',
+                'members': ['serviceAccount:lib3@serviceaccount.com']
+            }]),
             bucket='lib3-backup.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['user:user@example.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user@example.com']
+            }]),
             bucket='lib3-corpus.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['user:user@example.com']
-                }, {
-                    'role': 'roles/storage.objectAdmin',
-                    'members': ['serviceAccount:lib3@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user@example.com']
+            }, {
+                'role': 'roles/storage.objectAdmin',
+                'members': ['serviceAccount:lib3@serviceaccount.com']
+            }]),
             bucket='lib3-corpus.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['user:user@example.com']
-                }, {
-                    'role': 'roles/storage.objectAdmin',
-                    'members': ['serviceAccount:lib3@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user@example.com']
+            }, {
+                'role': 'roles/storage.objectAdmin',
+                'members': ['serviceAccount:lib3@serviceaccount.com']
+            }]),
             bucket='lib3-logs.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['user:user@example.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user@example.com']
+            }]),
             bucket='lib3-quarantine.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['user:user@example.com']
-                }, {
-                    'role': 'roles/storage.objectAdmin',
-                    'members': ['serviceAccount:lib3@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:user@example.com']
+            }, {
+                'role': 'roles/storage.objectAdmin',
+                'members': ['serviceAccount:lib3@serviceaccount.com']
+            }]),
             bucket='lib3-quarantine.clusterfuzz-external.appspot.com'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['serviceAccount:lib3@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['serviceAccount:lib3@serviceaccount.com']
+            }]),
             bucket='clusterfuzz-external-deployment'),
         mock.call(
-            body={
-                'resourceId':
-                    'fake',
-                'kind':
-                    'storage#policy',
-                'etag':
-                    'fake',
-                'bindings': [{
-                    'role': 'roles/storage.objectViewer',
-                    'members': ['serviceAccount:lib3@serviceaccount.com']
-                }]
-            },
+            body=_iam_policy([{
+                'role': 'roles/storage.objectViewer',
+                'members': ['serviceAccount:lib3@serviceaccount.com']
+            }]),
             bucket='global-corpus.clusterfuzz-external.appspot.com')
     ])
 
@@ -1587,55 +1207,40 @@ class OssFuzzProjectSetupTest(unittest.TestCase):
         },
     ])
 
+    job_topic_libs = ('lib1', 'lib3', 'lib4', 'lib5', 'lib6', 'lib7', 'lib8',
+                      'lib9')
     expected_topics = [
         'projects/clusterfuzz-external/topics/jobs-linux',
         'projects/clusterfuzz-external/topics/other',
-        'projects/clusterfuzz-external/topics/jobs-lib1-linux',
-        'projects/clusterfuzz-external/topics/jobs-lib3-linux',
-        'projects/clusterfuzz-external/topics/jobs-lib4-linux',
-        'projects/clusterfuzz-external/topics/jobs-lib5-linux',
-        'projects/clusterfuzz-external/topics/jobs-lib6-linux',
-        'projects/clusterfuzz-external/topics/jobs-lib7-linux',
-        'projects/clusterfuzz-external/topics/jobs-lib8-linux',
-        'projects/clusterfuzz-external/topics/jobs-lib9-linux',
+    ] + [
+        f'projects/clusterfuzz-external/topics/jobs-{lib}-linux'
+        for lib in job_topic_libs
     ]
-    self.assertCountEqual(expected_topics,
-                          list(pubsub_client.list_topics('projects/' + app_id)))
-
-    for topic in expected_topics[2:]:
-      lib = posixpath.basename(topic).split('-')[1]
-      self.assertCountEqual([
-          'projects/clusterfuzz-external/subscriptions/'
-          f'jobs-{lib}-linux',
-      ], pubsub_client.list_topic_subscriptions(topic))
-
-    self.assertIsNotNone(pubsub_client.get_topic(unmanaged_topic_name))
-    self.assertIsNotNone(pubsub_client.get_topic(other_topic_name))
-    self.assertIsNone(pubsub_client.get_topic(old_topic_name))
-    self.assertIsNone(pubsub_client.get_subscription(old_subscription_name))
-
+    topics = list(pubsub_client.list_topics('projects/' + app_id))
+    self.assertCountEqual(expected_topics, topics)
 
-URL_RESULTS = ast.literal_eval(_read_data_file('url_results.txt'))
+    for lib in job_topic_libs:
+      self.assertCountEqual(
+          [f'projects/clusterfuzz-external/subscriptions/jobs-{lib}-linux'],
+          pubsub_client.list_topic_subscriptions(
+              f'projects/clusterfuzz-external/topics/jobs-{lib}-linux'))
 
+    self.assertIsNone(pubsub_client.get_topic(old_topic_name))
+    self.assertIsNone(pubsub_client.get_subscription(old_subscription_name))
 
-def mock_get_url(url):
-  """Mock get_url()."""
-  if url not in URL_RESULTS:
-    return None
 
-  return URL_RESULTS[url]
+@functools.lru_cache(maxsize=None)
+def _url_results():
+  """Return the mocked GitHub API responses, keyed by URL."""
+  return ast.literal_eval(_read_data_file('url_results.txt'))
 
 
 class MockRequestsGet:
   """Mock requests.get."""
 
   def __init__(self, url, params=None, auth=None, timeout=None):  # pylint: disable=unused-argument
-    if url in URL_RESULTS:
-      self.text = URL_RESULTS[url]
-      self.status_code = 200
-    else:
-      self.text = None
-      self.status_code = 500
+    self.text = _url_results().get(url)
+    self.status_code = 200 if self.text is not None else 500
 
 
 @test_utils.with_cloud_emulators('datastore')
@@ -1663,242 +1268,199 @@ class GetLibrariesTest(unittest.TestCase):
         })])
 
 
-def _mock_read_data(path):
-  """Mock read_data."""
-  if 'dbg' in path:
-    return json.dumps({
-        'projects': [{
-            'build_path': 'gs://bucket-dbg/a-b/%ENGINE%/%SANITIZER%/'
-                          '%TARGET%/([0-9]+).zip',
-            'name': '//a/b',
+DBG_PROJECTS_JSON = json.dumps({
+    'projects': [{
+        'build_path': 'gs://bucket-dbg/a-b/%ENGINE%/%SANITIZER%/'
+                      '%TARGET%/([0-9]+).zip',
+        'name': '//a/b',
+        'fuzzing_engines': ['libfuzzer', 'honggfuzz'],
+        'sanitizers': ['address']
+    }]
+})
+
+# Build path shared by the pixel8 and mte android projects.
+ANDROID_A_B_BUILD_PATH = (
+    'gs://bucket-android/a-b-android/%ENGINE%/%SANITIZER%/'
+    '%TARGET%/([0-9]+).zip')
+
+ANDROID_PROJECTS_JSON = json.dumps({
+    'projects': [{
+        'build_path': 'gs://bucket-android/%ENGINE%/%SANITIZER%/'
+                      '%TARGET%/([0-9]+).zip',
+        'name': 'android_pixel7',
+        'fuzzing_engines': ['libfuzzer'],
+        'architectures': ['arm'],
+        'sanitizers': ['hardware'],
+        'platform': 'ANDROID',
+        'queue_id': 'pixel7'
+    }, {
+        'build_path': ANDROID_A_B_BUILD_PATH,
+        'name': 'android_pixel8',
+        'fuzzing_engines': ['libfuzzer', 'afl'],
+        'architectures': ['x86_64'],
+        'sanitizers': ['address'],
+        'platform': 'ANDROID_X86',
+        'queue_id': 'pixel8'
+    }, {
+        'build_path': ANDROID_A_B_BUILD_PATH,
+        'name': 'android_mte',
+        'fuzzing_engines': ['libfuzzer'],
+        'architectures': ['arm'],
+        'sanitizers': ['none'],
+        'platform': 'ANDROID_MTE',
+        'queue_id': 'pixel8'
+    }]
+})
+
+DEFAULT_PROJECTS_JSON = json.dumps({
+    'projects': [
+        {
+            'build_path':
+                'gs://bucket/a-b/%ENGINE%/%SANITIZER%/%TARGET%/([0-9]+).zip',
+            'name':
+                '//a/b',
             'fuzzing_engines': ['libfuzzer', 'honggfuzz'],
-            'sanitizers': ['address']
-        }]
-    })
-
-  if 'android' in path:
-    return json.dumps({
-        'projects': [{
-            'build_path': 'gs://bucket-android/%ENGINE%/%SANITIZER%/'
-                          '%TARGET%/([0-9]+).zip',
-            'name': 'android_pixel7',
-            'fuzzing_engines': ['libfuzzer'],
-            'architectures': ['arm'],
-            'sanitizers': ['hardware'],
-            'platform': 'ANDROID',
-            'queue_id': 'pixel7'
-        }, {
+            'sanitizers': ['address', 'memory']
+        },
+        {
             'build_path':
-                'gs://bucket-android/a-b-android/%ENGINE%/%SANITIZER%/'
-                '%TARGET%/([0-9]+).zip',
-            'name': 'android_pixel8',
-            'fuzzing_engines': ['libfuzzer', 'afl'],
-            'architectures': ['x86_64'],
-            'sanitizers': ['address'],
-            'platform': 'ANDROID_X86',
-            'queue_id': 'pixel8'
-        }, {
+                'gs://bucket/c-d/%ENGINE%/%SANITIZER%/%TARGET%/([0-9]+).zip',
+            'name':
+                '//c/d',
+            'fuzzing_engines': ['libfuzzer', 'googlefuzztest'],
+            'sanitizers': ['address']
+        },
+        {
             'build_path':
-                'gs://bucket-android/a-b-android/%ENGINE%/%SANITIZER%/'
-                '%TARGET%/([0-9]+).zip',
-            'name': 'android_mte',
+                'gs://bucket/e-f/%ENGINE%/%SANITIZER%/%TARGET%/([0-9]+).zip',
+            'name':
+                '//e/f',
             'fuzzing_engines': ['libfuzzer'],
-            'architectures': ['arm'],
-            'sanitizers': ['none'],
-            'platform': 'ANDROID_MTE',
-            'queue_id': 'pixel8'
-        }]
-    })
-
-  return json.dumps({
-      'projects': [
-          {
-              'build_path':
-                  'gs://bucket/a-b/%ENGINE%/%SANITIZER%/%TARGET%/([0-9]+).zip',
-              'name':
-                  '//a/b',
-              'fuzzing_engines': ['libfuzzer', 'honggfuzz'],
-              'sanitizers': ['address', 'memory']
-          },
-          {
-              'build_path':
-                  'gs://bucket/c-d/%ENGINE%/%SANITIZER%/%TARGET%/([0-9]+).zip',
-              'name':
-                  '//c/d',
-              'fuzzing_engines': ['libfuzzer', 'googlefuzztest'],
-              'sanitizers': ['address']
-          },
-          {
-              'build_path':
-                  'gs://bucket/e-f/%ENGINE%/%SANITIZER%/%TARGET%/([0-9]+).zip',
-              'name':
-                  '//e/f',
-              'fuzzing_engines': ['libfuzzer'],
-              'sanitizers': ['none']
-          },
-      ]
-  })
-
-
-@test_utils.with_cloud_emulators('datastore', 'pubsub')
-class GenericProjectSetupTest(unittest.TestCase):
-  """Test generic project setup."""
-
-  def setUp(self):
-    self.maxDiff = None
-
-    helpers.patch_environ(self)
-
-    data_types.Job(name='old_unmanaged').put()
-    data_types.Job(
-        name='old_managed',
-        environment_string='MANAGED = True\nPROJECT_NAME = old').put()
-
-    self.libfuzzer = data_types.Fuzzer(
-        name='libFuzzer', jobs=['old_unmanaged', 'old_managed'])
-    self.libfuzzer.put()
-
-    self.afl = data_types.Fuzzer(name='afl', jobs=[])
-    self.afl.put()
-
-    self.honggfuzz = data_types.Fuzzer(name='honggfuzz', jobs=[])
-    self.honggfuzz.put()
+            'sanitizers': ['none']
+        },
+    ]
+})
 
-    self.gft = data_types.Fuzzer(name='googlefuzztest', jobs=[])
-    self.gft.put()
+# Mocked projects.json contents keyed by the bucket they are read from. Any
+# other bucket gets DEFAULT_PROJECTS_JSON.
+PROJECTS_JSON_BY_BUCKET = {
+    'bucket-dbg': DBG_PROJECTS_JSON,
+    'bucket-android': ANDROID_PROJECTS_JSON,
+}
 
-    self.centipede = data_types.Fuzzer(name='centipede', jobs=[])
-    self.centipede.put()
 
-    helpers.patch(self, [
-        'clusterfuzz._internal.config.local_config.ProjectConfig',
-        ('get_application_id_2',
-         'clusterfuzz._internal.base.utils.get_application_id'),
-        'clusterfuzz._internal.google_cloud_utils.storage.build',
-        'clusterfuzz._internal.google_cloud_utils.storage.read_data',
-        'time.sleep',
-        'handlers.base_handler.Handler.is_cron',
-    ])
+def _mock_read_data(path):
+  """Mock read_data."""
+  bucket = path.split('/')[2]
+  return PROJECTS_JSON_BY_BUCKET.get(bucket, DEFAULT_PROJECTS_JSON)
 
-    self.mock.read_data.side_effect = _mock_read_data
 
-    self.mock.ProjectConfig.return_value = mock_config.MockConfig({
-        'project_setup': [
-            {
-                'source': 'gs://bucket/projects.json',
-                'build_type': 'FUZZ_TARGET_BUILD_BUCKET_PATH',
-                'experimental_sanitizers': ['memory'],
-                'build_buckets': {
-                    'afl': 'clusterfuzz-builds-afl',
-                    'honggfuzz': 'clusterfuzz-builds-honggfuzz',
-                    'googlefuzztest': 'clusterfuzz-builds-googlefuzztest',
-                    'libfuzzer': 'clusterfuzz-builds',
-                    'libfuzzer_i386': 'clusterfuzz-builds-i386',
-                    'no_engine': 'clusterfuzz-builds-no-engine',
+GENERIC_PROJECT_CONFIG = {
+    'project_setup': [
+        {
+            'source': 'gs://bucket/projects.json',
+            'build_type': 'FUZZ_TARGET_BUILD_BUCKET_PATH',
+            'experimental_sanitizers': ['memory'],
+            'build_buckets': {
+                'afl': 'clusterfuzz-builds-afl',
+                'honggfuzz': 'clusterfuzz-builds-honggfuzz',
+                'googlefuzztest': 'clusterfuzz-builds-googlefuzztest',
+                'libfuzzer': 'clusterfuzz-builds',
+                'libfuzzer_i386': 'clusterfuzz-builds-i386',
+                'no_engine': 'clusterfuzz-builds-no-engine',
+            },
+            'additional_vars': {
+                'all': {
+                    'STRING_VAR': 'VAL',
+                    'BOOL_VAR': True,
+                    'INT_VAR': 0,
                 },
-                'additional_vars': {
-                    'all': {
-                        'STRING_VAR': 'VAL',
-                        'BOOL_VAR': True,
-                        'INT_VAR': 0,
+                'libfuzzer': {
+                    'address': {
+                        'ASAN_VAR': 'VAL',
                     },
-                    'libfuzzer': {
-                        'address': {
-                            'ASAN_VAR': 'VAL',
-                        },
-                        'memory': {
-                            'MSAN_VAR': 'VAL',
-                        },
-                        'none': {},
-                    }
+                    'memory': {
+                        'MSAN_VAR': 'VAL',
+                    },
+                    'none': {},
                 }
+            }
+        },
+        {
+            'source': 'gs://bucket-dbg/projects.json',
+            'job_suffix': '_dbg',
+            'external_config': {
+                'reproduction_topic': 'projects/proj/topics/reproduction',
+                'updates_subscription': 'projects/proj/subscriptions/updates',
             },
-            {
-                'source': 'gs://bucket-dbg/projects.json',
-                'job_suffix': '_dbg',
-                'external_config': {
-                    'reproduction_topic':
-                        'projects/proj/topics/reproduction',
-                    'updates_subscription':
-                        'projects/proj/subscriptions/updates',
-                },
-                'build_type': 'FUZZ_TARGET_BUILD_BUCKET_PATH',
-                'build_buckets': {
-                    'afl': 'clusterfuzz-builds-afl-dbg',
-                    'honggfuzz': 'clusterfuzz-builds-honggfuzz-dbg',
-                    'googlefuzztest': 'clusterfuzz-builds-googlefuzztest-dbg',
-                    'libfuzzer': 'clusterfuzz-builds-dbg',
-                    'libfuzzer_i386': 'clusterfuzz-builds-i386-dbg',
-                    'no_engine': 'clusterfuzz-builds-no-engine-dbg',
+            'build_type': 'FUZZ_TARGET_BUILD_BUCKET_PATH',
+            'build_buckets': {
+                'afl': 'clusterfuzz-builds-afl-dbg',
+                'honggfuzz': 'clusterfuzz-builds-honggfuzz-dbg',
+                'googlefuzztest': 'clusterfuzz-builds-googlefuzztest-dbg',
+                'libfuzzer': 'clusterfuzz-builds-dbg',
+                'libfuzzer_i386': 'clusterfuzz-builds-i386-dbg',
+                'no_engine': 'clusterfuzz-builds-no-engine-dbg',
+            },
+            'additional_vars': {
+                'all': {
+                    'STRING_VAR': 'VAL-dbg',
+                    'BOOL_VAR': True,
+                    'INT_VAR': 0,
                 },
-                'additional_vars': {
-                    'all': {
-                        'STRING_VAR': 'VAL-dbg',
-                        'BOOL_VAR': True,
-                        'INT_VAR': 0,
+                'libfuzzer': {
+                    'address': {
+                        'ASAN_VAR': 'VAL-dbg',
                     },
-                    'libfuzzer': {
-                        'address': {
-                            'ASAN_VAR': 'VAL-dbg',
-                        },
-                        'memory': {
-                            'MSAN_VAR': 'VAL-dbg',
-                        }
+                    'memory': {
+                        'MSAN_VAR': 'VAL-dbg',
                     }
                 }
+            }
+        },
+        {
+            'source': 'gs://bucket-android/projects.json',
+            'build_type': 'FUZZ_TARGET_BUILD_BUCKET_PATH',
+            'build_buckets': {
+                'afl': 'clusterfuzz-builds-afl-android',
+                'libfuzzer': 'clusterfuzz-builds-android',
+                'libfuzzer_arm': 'clusterfuzz-builds-android',
+                'no_engine': 'clusterfuzz-builds-no-engine-android',
             },
-            {
-                'source': 'gs://bucket-android/projects.json',
-                'build_type': 'FUZZ_TARGET_BUILD_BUCKET_PATH',
-                'build_buckets': {
-                    'afl': 'clusterfuzz-builds-afl-android',
-                    'libfuzzer': 'clusterfuzz-builds-android',
-                    'libfuzzer_arm': 'clusterfuzz-builds-android',
-                    'no_engine': 'clusterfuzz-builds-no-engine-android',
+            'additional_vars': {
+                'all': {
+                    'STRING_VAR': 'VAL-android',
+                    'BOOL_VAR': True,
+                    'INT_VAR': 0,
                 },
-                'additional_vars': {
-                    'all': {
-                        'STRING_VAR': 'VAL-android',
-                        'BOOL_VAR': True,
-                        'INT_VAR': 0,
-                    },
-                    'libfuzzer': {
-                        'address': {
-                            'ASAN_VAR': 'VAL-android',
-                        },
-                        'memory': {
-                            'MSAN_VAR': 'VAL-android',
-                        }
+                'libfuzzer': {
+                    'address': {
+                        'ASAN_VAR': 'VAL-android',
                     },
-                    'afl': {
-                        'address': {
-                            'ASAN_VAR': 'VAL-android',
-                        },
+                    'memory': {
+                        'MSAN_VAR': 'VAL-android',
                     }
+                },
+                'afl': {
+                    'address': {
+                        'ASAN_VAR': 'VAL-android',
+                    },
                 }
-            },
-        ],
-    })
-
-    # Should be deleted.
-    job = data_types.Job(
-        name='libfuzzer_asan_c-d_dbg', environment_string='MANAGED = True')
-    job.put()
-
-  def test_execute(self):
-    """Tests executing of cron job."""
-    pubsub_client = pubsub.PubSubClient()
-    self.mock.get_application_id_2.return_value = 'clusterfuzz-external'
-    app_id = utils.get_application_id()
-    unmanaged_topic_name = pubsub.topic_name(app_id, 'jobs-linux')
-    other_topic_name = pubsub.topic_name(app_id, 'other')
-    pubsub_client.create_topic(unmanaged_topic_name)
-    pubsub_client.create_topic(other_topic_name)
-    project_setup.main()
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_asan_a-b').get()
-    self.assertEqual(
+            }
+        },
+    ],
+}
+
+EXPECTED_GENERIC_TOPICS = (
+    'projects/clusterfuzz-external/topics/jobs-linux',
+    'projects/clusterfuzz-external/topics/other',
+    'projects/clusterfuzz-external/topics/jobs-android-pixel7',
+    'projects/clusterfuzz-external/topics/jobs-android-x86-pixel8',
+    'projects/clusterfuzz-external/topics/jobs-android-mte-pixel8',
+)
+
+EXPECTED_GENERIC_ENVIRONMENTS = {
+    'libfuzzer_asan_a-b': (
         'FUZZ_TARGET_BUILD_BUCKET_PATH = '
         'gs://bucket/a-b/libfuzzer/address/%TARGET%/([0-9]+).zip\n'
         'PROJECT_NAME = //a/b\nSUMMARY_PREFIX = //a/b\nMANAGED = True\n'
@@ -1907,15 +1469,8 @@ class GenericProjectSetupTest(unittest.TestCase):
         'ASAN_VAR = VAL\n'
         'BOOL_VAR = True\n'
         'INT_VAR = 0\n'
-        'STRING_VAR = VAL\n', job.environment_string)
-    self.assertCountEqual(['engine_asan', 'libfuzzer', 'prune'], job.templates)
-    self.assertEqual(None, job.external_reproduction_topic)
-    self.assertEqual(None, job.external_updates_subscription)
-    self.assertFalse(job.is_external())
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_msan_a-b').get()
-    self.assertEqual(
+        'STRING_VAR = VAL\n'),
+    'libfuzzer_msan_a-b': (
         'FUZZ_TARGET_BUILD_BUCKET_PATH = '
         'gs://bucket/a-b/libfuzzer/memory/%TARGET%/([0-9]+).zip\n'
         'PROJECT_NAME = //a/b\nSUMMARY_PREFIX = //a/b\nMANAGED = True\n'
@@ -1925,15 +1480,8 @@ class GenericProjectSetupTest(unittest.TestCase):
         'BOOL_VAR = True\n'
         'INT_VAR = 0\n'
         'MSAN_VAR = VAL\n'
-        'STRING_VAR = VAL\n', job.environment_string)
-    self.assertCountEqual(['engine_msan', 'libfuzzer'], job.templates)
-    self.assertEqual(None, job.external_reproduction_topic)
-    self.assertEqual(None, job.external_updates_subscription)
-    self.assertFalse(job.is_external())
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_asan_c-d').get()
-    self.assertEqual(
+        'STRING_VAR = VAL\n'),
+    'libfuzzer_asan_c-d': (
         'FUZZ_TARGET_BUILD_BUCKET_PATH = '
         'gs://bucket/c-d/libfuzzer/address/%TARGET%/([0-9]+).zip\n'
         'PROJECT_NAME = //c/d\nSUMMARY_PREFIX = //c/d\nMANAGED = True\n'
@@ -1942,15 +1490,8 @@ class GenericProjectSetupTest(unittest.TestCase):
         'ASAN_VAR = VAL\n'
         'BOOL_VAR = True\n'
         'INT_VAR = 0\n'
-        'STRING_VAR = VAL\n', job.environment_string)
-    self.assertCountEqual(['engine_asan', 'libfuzzer', 'prune'], job.templates)
-    self.assertEqual(None, job.external_reproduction_topic)
-    self.assertEqual(None, job.external_updates_subscription)
-    self.assertFalse(job.is_external())
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_nosanitizer_e-f').get()
-    self.assertEqual(
+        'STRING_VAR = VAL\n'),
+    'libfuzzer_nosanitizer_e-f': (
         'FUZZ_TARGET_BUILD_BUCKET_PATH = '
         'gs://bucket/e-f/libfuzzer/none/%TARGET%/([0-9]+).zip\n'
         'PROJECT_NAME = //e/f\nSUMMARY_PREFIX = //e/f\nMANAGED = True\n'
@@ -1958,19 +1499,8 @@ class GenericProjectSetupTest(unittest.TestCase):
         'FILE_GITHUB_ISSUE = False\n'
         'BOOL_VAR = True\n'
         'INT_VAR = 0\n'
-        'STRING_VAR = VAL\n', job.environment_string)
-    self.assertCountEqual(['libfuzzer', 'prune'], job.templates)
-    self.assertEqual(None, job.external_reproduction_topic)
-    self.assertEqual(None, job.external_updates_subscription)
-    self.assertFalse(job.is_external())
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_asan_c-d_dbg').get()
-    self.assertIsNone(job)
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_asan_a-b_dbg').get()
-    self.assertEqual(
+        'STRING_VAR = VAL\n'),
+    'libfuzzer_asan_a-b_dbg': (
         'FUZZ_TARGET_BUILD_BUCKET_PATH = '
         'gs://bucket-dbg/a-b/libfuzzer/address/%TARGET%/([0-9]+).zip\n'
         'PROJECT_NAME = //a/b\nSUMMARY_PREFIX = //a/b\nMANAGED = True\n'
@@ -1979,17 +1509,8 @@ class GenericProjectSetupTest(unittest.TestCase):
         'ASAN_VAR = VAL-dbg\n'
         'BOOL_VAR = True\n'
         'INT_VAR = 0\n'
-        'STRING_VAR = VAL-dbg\n', job.environment_string)
-    self.assertCountEqual(['engine_asan', 'libfuzzer', 'prune'], job.templates)
-    self.assertEqual('projects/proj/topics/reproduction',
-                     job.external_reproduction_topic)
-    self.assertEqual('projects/proj/subscriptions/updates',
-                     job.external_updates_subscription)
-    self.assertTrue(job.is_external())
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'honggfuzz_asan_a-b').get()
-    self.assertEqual(
+        'STRING_VAR = VAL-dbg\n'),
+    'honggfuzz_asan_a-b': (
         'FUZZ_TARGET_BUILD_BUCKET_PATH = '
         'gs://bucket/a-b/honggfuzz/address/%TARGET%/([0-9]+).zip\n'
         'PROJECT_NAME = //a/b\nSUMMARY_PREFIX = //a/b\nMANAGED = True\n'
@@ -1998,15 +1519,8 @@ class GenericProjectSetupTest(unittest.TestCase):
         'FILE_GITHUB_ISSUE = False\n'
         'BOOL_VAR = True\n'
         'INT_VAR = 0\n'
-        'STRING_VAR = VAL\n', job.environment_string)
-    self.assertCountEqual(['engine_asan', 'honggfuzz'], job.templates)
-    self.assertEqual(None, job.external_reproduction_topic)
-    self.assertEqual(None, job.external_updates_subscription)
-    self.assertFalse(job.is_external())
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'honggfuzz_asan_a-b_dbg').get()
-    self.assertEqual(
+        'STRING_VAR = VAL\n'),
+    'honggfuzz_asan_a-b_dbg': (
         'FUZZ_TARGET_BUILD_BUCKET_PATH = '
         'gs://bucket-dbg/a-b/honggfuzz/address/%TARGET%/([0-9]+).zip\n'
         'PROJECT_NAME = //a/b\nSUMMARY_PREFIX = //a/b\nMANAGED = True\n'
@@ -2015,17 +1529,8 @@ class GenericProjectSetupTest(unittest.TestCase):
         'FILE_GITHUB_ISSUE = False\n'
         'BOOL_VAR = True\n'
         'INT_VAR = 0\n'
-        'STRING_VAR = VAL-dbg\n', job.environment_string)
-    self.assertCountEqual(['engine_asan', 'honggfuzz'], job.templates)
-    self.assertEqual('projects/proj/topics/reproduction',
-                     job.external_reproduction_topic)
-    self.assertEqual('projects/proj/subscriptions/updates',
-                     job.external_updates_subscription)
-    self.assertTrue(job.is_external())
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'googlefuzztest_asan_c-d').get()
-    self.assertEqual(
+        'STRING_VAR = VAL-dbg\n'),
+    'googlefuzztest_asan_c-d': (
         'FUZZ_TARGET_BUILD_BUCKET_PATH = '
         'gs://bucket/c-d/googlefuzztest/address/%TARGET%/([0-9]+).zip\n'
         'PROJECT_NAME = //c/d\nSUMMARY_PREFIX = //c/d\nMANAGED = True\n'
@@ -2033,15 +1538,8 @@ class GenericProjectSetupTest(unittest.TestCase):
         'FILE_GITHUB_ISSUE = False\n'
         'BOOL_VAR = True\n'
         'INT_VAR = 0\n'
-        'STRING_VAR = VAL\n', job.environment_string)
-    self.assertCountEqual(['engine_asan', 'googlefuzztest'], job.templates)
-    self.assertEqual(None, job.external_reproduction_topic)
-    self.assertEqual(None, job.external_updates_subscription)
-    self.assertFalse(job.is_external())
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_hwasan_android_pixel7').get()
-    self.assertEqual(
+        'STRING_VAR = VAL\n'),
+    'libfuzzer_hwasan_android_pixel7': (
         'FUZZ_TARGET_BUILD_BUCKET_PATH = '
         'gs://bucket-android/libfuzzer/hardware/%TARGET%/([0-9]+).zip\n'
         'PROJECT_NAME = android\n'
@@ -2051,17 +1549,8 @@ class GenericProjectSetupTest(unittest.TestCase):
         'FILE_GITHUB_ISSUE = False\n'
         'BOOL_VAR = True\n'
         'INT_VAR = 0\n'
-        'STRING_VAR = VAL-android\n', job.environment_string)
-    self.assertCountEqual(['engine_asan', 'libfuzzer', 'android'],
-                          job.templates)
-    self.assertEqual(None, job.external_reproduction_topic)
-    self.assertEqual(None, job.external_updates_subscription)
-    self.assertFalse(job.is_external())
-    self.assertEqual("ANDROID:PIXEL7", job.platform)
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'afl_asan_android_pixel8').get()
-    self.assertEqual(
+        'STRING_VAR = VAL-android\n'),
+    'afl_asan_android_pixel8': (
         'FUZZ_TARGET_BUILD_BUCKET_PATH = '
         'gs://bucket-android/a-b-android/afl/address/%TARGET%/([0-9]+).zip\n'
         'PROJECT_NAME = android\n'
@@ -2073,16 +1562,8 @@ class GenericProjectSetupTest(unittest.TestCase):
         'ASAN_VAR = VAL-android\n'
         'BOOL_VAR = True\n'
         'INT_VAR = 0\n'
-        'STRING_VAR = VAL-android\n', job.environment_string)
-    self.assertCountEqual(['afl', 'android', 'engine_asan'], job.templates)
-    self.assertEqual(None, job.external_reproduction_topic)
-    self.assertEqual(None, job.external_updates_subscription)
-    self.assertFalse(job.is_external())
-    self.assertEqual("ANDROID_X86:PIXEL8", job.platform)
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_asan_android_pixel8').get()
-    self.assertEqual(
+        'STRING_VAR = VAL-android\n'),
+    'libfuzzer_asan_android_pixel8': (
         'FUZZ_TARGET_BUILD_BUCKET_PATH = '
         'gs://bucket-android/a-b-android/libfuzzer/address/%TARGET%/([0-9]+).zip\n'
         'PROJECT_NAME = android\n'
@@ -2093,17 +1574,8 @@ class GenericProjectSetupTest(unittest.TestCase):
         'ASAN_VAR = VAL-android\n'
         'BOOL_VAR = True\n'
         'INT_VAR = 0\n'
-        'STRING_VAR = VAL-android\n', job.environment_string)
-    self.assertCountEqual(['libfuzzer', 'android', 'engine_asan', 'prune'],
-                          job.templates)
-    self.assertEqual(None, job.external_reproduction_topic)
-    self.assertEqual(None, job.external_updates_subscription)
-    self.assertFalse(job.is_external())
-    self.assertEqual("ANDROID_X86:PIXEL8", job.platform)
-
-    job = data_types.Job.query(
-        data_types.Job.name == 'libfuzzer_nosanitizer_android_mte').get()
-    self.assertEqual(
+        'STRING_VAR = VAL-android\n'),
+    'libfuzzer_nosanitizer_android_mte': (
         'FUZZ_TARGET_BUILD_BUCKET_PATH = '
         'gs://bucket-android/a-b-android/libfuzzer/none/%TARGET%/([0-9]+).zip\n'
         'PROJECT_NAME = android\n'
@@ -2113,43 +1585,147 @@ class GenericProjectSetupTest(unittest.TestCase):
         'FILE_GITHUB_ISSUE = False\n'
         'BOOL_VAR = True\n'
         'INT_VAR = 0\n'
-        'STRING_VAR = VAL-android\n', job.environment_string)
-    self.assertCountEqual(['libfuzzer', 'android', 'prune'], job.templates)
-    self.assertEqual(None, job.external_reproduction_topic)
-    self.assertEqual(None, job.external_updates_subscription)
-    self.assertFalse(job.is_external())
-    self.assertEqual("ANDROID_MTE:PIXEL8", job.platform)
+        'STRING_VAR = VAL-android\n'),
+}
+
+# Expected (templates, external reproduction topic, external updates
+# subscription, is external, platform) for each job created by the generic
+# setup. A platform value of None means the platform is not checked.
+EXPECTED_GENERIC_JOBS = {
+    'libfuzzer_asan_a-b': (['engine_asan', 'libfuzzer', 'prune'], None, None,
+                           False, None),
+    'libfuzzer_msan_a-b': (['engine_msan', 'libfuzzer'], None, None, False,
+                           None),
+    'libfuzzer_asan_c-d': (['engine_asan', 'libfuzzer', 'prune'], None, None,
+                           False, None),
+    'libfuzzer_nosanitizer_e-f': (['libfuzzer', 'prune'], None, None, False,
+                                  None),
+    'libfuzzer_asan_a-b_dbg': (
+        ['engine_asan', 'libfuzzer', 'prune'],
+        'projects/proj/topics/reproduction',
+        'projects/proj/subscriptions/updates',
+        True,
+        None,
+    ),
+    'honggfuzz_asan_a-b': (['engine_asan', 'honggfuzz'], None, None, False,
+                           None),
+    'honggfuzz_asan_a-b_dbg': (
+        ['engine_asan', 'honggfuzz'],
+        'projects/proj/topics/reproduction',
+        'projects/proj/subscriptions/updates',
+        True,
+        None,
+    ),
+    'googlefuzztest_asan_c-d': (['engine_asan', 'googlefuzztest'], None, None,
+                                False, None),
+    'libfuzzer_hwasan_android_pixel7': (['engine_asan', 'libfuzzer', 'android'],
+                                        None, None, False, 'ANDROID:PIXEL7'),
+    'afl_asan_android_pixel8': (['afl', 'android', 'engine_asan'], None, None,
+                                False, 'ANDROID_X86:PIXEL8'),
+    'libfuzzer_asan_android_pixel8': (
+        ['libfuzzer', 'android', 'engine_asan', 'prune'],
+        None,
+        None,
+        False,
+        'ANDROID_X86:PIXEL8',
+    ),
+    'libfuzzer_nosanitizer_android_mte': (
+        ['libfuzzer', 'android', 'prune'],
+        None,
+        None,
+        False,
+        'ANDROID_MTE:PIXEL8',
+    ),
+}
 
-    expected_topics = [
-        'projects/clusterfuzz-external/topics/jobs-linux',
-        'projects/clusterfuzz-external/topics/other',
-        'projects/clusterfuzz-external/topics/jobs-android-pixel7',
-        'projects/clusterfuzz-external/topics/jobs-android-x86-pixel8',
-        'projects/clusterfuzz-external/topics/jobs-android-mte-pixel8',
-    ]
-    self.assertCountEqual(expected_topics,
-                          list(pubsub_client.list_topics('projects/' + app_id)))
 
-    self.assertCountEqual(
-        ['projects/clusterfuzz-external/subscriptions/jobs-android-pixel7'],
-        pubsub_client.list_topic_subscriptions(
-            'projects/clusterfuzz-external/topics/jobs-android-pixel7'))
+@test_utils.with_cloud_emulators('datastore', 'pubsub')
+class GenericProjectSetupTest(unittest.TestCase):
+  """Test generic project setup."""
+
+  def setUp(self):
+    self.maxDiff = None
+
+    helpers.patch_environ(self)
+
+    self.libfuzzer = data_types.Fuzzer(
+        name='libFuzzer', jobs=['old_unmanaged', 'old_managed'])
+    self.afl = data_types.Fuzzer(name='afl', jobs=[])
+    self.honggfuzz = data_types.Fuzzer(name='honggfuzz', jobs=[])
+    self.gft = data_types.Fuzzer(name='googlefuzztest', jobs=[])
+    self.centipede = data_types.Fuzzer(name='centipede', jobs=[])
+
+    ndb.put_multi([
+        data_types.Job(name='old_unmanaged'),
+        data_types.Job(
+            name='old_managed',
+            environment_string='MANAGED = True\nPROJECT_NAME = old'),
+        # Should be deleted.
+        data_types.Job(
+            name='libfuzzer_asan_c-d_dbg', environment_string='MANAGED = True'),
+        self.libfuzzer,
+        self.afl,
+        self.honggfuzz,
+        self.gft,
+        self.centipede,
+    ])
+
+    helpers.patch(self, [
+        'clusterfuzz._internal.config.local_config.ProjectConfig',
+        ('get_application_id_2',
+         'clusterfuzz._internal.base.utils.get_application_id'),
+        'clusterfuzz._internal.google_cloud_utils.storage.build',
+        'clusterfuzz._internal.google_cloud_utils.storage.read_data',
+    ])
 
-    self.assertCountEqual(
-        ['projects/clusterfuzz-external/subscriptions/jobs-android-x86-pixel8'],
-        pubsub_client.list_topic_subscriptions(
-            'projects/clusterfuzz-external/topics/jobs-android-x86-pixel8'))
+    self.mock.read_data.side_effect = _mock_read_data
 
-    self.assertCountEqual(
-        ['projects/clusterfuzz-external/subscriptions/jobs-android-mte-pixel8'],
-        pubsub_client.list_topic_subscriptions(
-            'projects/clusterfuzz-external/topics/jobs-android-mte-pixel8'))
+    self.mock.ProjectConfig.return_value = mock_config.MockConfig(
+        GENERIC_PROJECT_CONFIG)
 
-    self.assertIsNotNone(pubsub_client.get_topic(unmanaged_topic_name))
-    self.assertIsNotNone(pubsub_client.get_topic(other_topic_name))
+  def test_execute(self):
+    """Tests executing of cron job."""
+    pubsub_client = pubsub.PubSubClient()
+    self.mock.get_application_id_2.return_value = 'clusterfuzz-external'
+    app_id = utils.get_application_id()
+    unmanaged_topic_name = pubsub.topic_name(app_id, 'jobs-linux')
+    other_topic_name = pubsub.topic_name(app_id, 'other')
+    pubsub_client.create_topic(unmanaged_topic_name)
+    pubsub_client.create_topic(other_topic_name)
+    project_setup.main()
 
-    libfuzzer = data_types.Fuzzer.query(
-        data_types.Fuzzer.name == 'libFuzzer').get()
+    jobs = {job.name: job for job in data_types.Job.query()}
+
+    for name, (templates, reproduction_topic, updates_subscription, is_external,
+               platform) in EXPECTED_GENERIC_JOBS.items():
+      with self.subTest(job=name):
+        job = jobs.get(name)
+        self.assertIsNotNone(job)
+        self.assertEqual(EXPECTED_GENERIC_ENVIRONMENTS[name],
+                         job.environment_string)
+        self.assertCountEqual(templates, job.templates)
+        self.assertEqual(
+            (reproduction_topic, updates_subscription, is_external),
+            (job.external_reproduction_topic, job.external_updates_subscription,
+             job.is_external()))
+        if platform is not None:
+          self.assertEqual(platform, job.platform)
+
+    # Stale managed job.
+    self.assertIsNone(jobs.get('libfuzzer_asan_c-d_dbg'))
+
+    topics = list(pubsub_client.list_topics('projects/' + app_id))
+    self.assertCountEqual(EXPECTED_GENERIC_TOPICS, topics)
+
+    for queue in ('android-pixel7', 'android-x86-pixel8', 'android-mte-pixel8'):
+      self.assertCountEqual(
+          [f'projects/clusterfuzz-external/subscriptions/jobs-{queue}'],
+          pubsub_client.list_topic_subscriptions(
+              f'projects/clusterfuzz-external/topics/jobs-{queue}'))
+
+    fuzzers = {fuzzer.name: fuzzer for fuzzer in data_types.Fuzzer.query()}
+
+    libfuzzer = fuzzers.get('libFuzzer')
     self.assertCountEqual([
         'libfuzzer_asan_a-b',
         'libfuzzer_asan_c-d',
@@ -2161,17 +1737,29 @@ class GenericProjectSetupTest(unittest.TestCase):
         'old_unmanaged',
     ], libfuzzer.jobs)
 
-    afl = data_types.Fuzzer.query(data_types.Fuzzer.name == 'afl').get()
-    self.assertCountEqual([
-        'afl_asan_android_pixel8',
-    ], afl.jobs)
+    afl = fuzzers.get('afl')
+    self.assertEqual(['afl_asan_android_pixel8'], afl.jobs)
 
-    honggfuzz = data_types.Fuzzer.query(
-        data_types.Fuzzer.name == 'honggfuzz').get()
-    self.assertCountEqual([
-        'honggfuzz_asan_a-b',
-    ], honggfuzz.jobs)
+    honggfuzz = fuzzers.get('honggfuzz')
+    self.assertEqual(['honggfuzz_asan_a-b'], honggfuzz.jobs)
+
+    gft = fuzzers.get('googlefuzztest')
+    self.assertEqual(['googlefuzztest_asan_c-d'], gft.jobs)
+
+  def test_failed_sync_leaves_no_unwritten_fuzzer_jobs(self):
+    """Tests that a failure part way through syncing a project does not leave
+    fuzzers mapped to jobs that were never written."""
+    helpers.patch(self, [
+        'clusterfuzz._internal.cron.project_setup.'
+        'create_pubsub_topics_for_queue_id',
+    ])
+    self.mock.create_pubsub_topics_for_queue_id.side_effect = (
+        project_setup.ProjectSetupError('Failed to create topic.'))
+
+    with self.assertRaises(project_setup.ProjectSetupError):
+      project_setup.main()
 
-    gft = data_types.Fuzzer.query(
-        data_types.Fuzzer.name == 'googlefuzztest').get()
-    self.assertCountEqual(['googlefuzztest_asan_c-d'], gft.jobs)
+    job_names = {job.name for job in data_types.Job.query()}
+    for fuzzer in data_types.Fuzzer.query():
+      with self.subTest(fuzzer=fuzzer.name):
+        self.assertEqual(set(), set(fuzzer.jobs) - job_names)